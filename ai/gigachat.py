@@ -3,13 +3,26 @@
 Реализует получение токена и генерацию выжимок текста.
 """
 
+import asyncio
+import aiohttp
+import hashlib
+import orjson
 import requests
 import logging
-from typing import Optional
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
 from dotenv import load_dotenv
 import os
 from pathlib import Path
 import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util import make_headers
+from urllib3.util.retry import Retry
 
 # Отключаем предупреждения о небезопасных SSL запросах
 # (GigaChat API использует самоподписанные сертификаты)
@@ -25,6 +38,98 @@ logger = logging.getLogger(__name__)
 OAUTH_URL = "https://ngw.devices.sberbank.ru:9443/api/v2/oauth"
 CHAT_COMPLETIONS_URL = "https://gigachat.devices.sberbank.ru/api/v1/chat/completions"
 
+# Системное сообщение для генерации выжимок
+SUMMARY_SYSTEM_MESSAGE = "Ты – ассистент, который делает краткие выжимки текста."
+
+# Максимальное количество одновременных запросов при пакетной генерации выжимок
+BATCH_CONCURRENCY = 8
+
+# База данных, в которой хранится кэш выжимок (таблица summary_cache).
+# По умолчанию - база данных проекта; при использовании CLI без сбора сообщений
+# путь можно переопределить, чтобы не создавать telegram_messages.db
+SUMMARY_CACHE_DB = Path(os.getenv('GIGACHAT_SUMMARY_CACHE_DB')
+                        or Path(__file__).parent.parent / 'telegram_messages.db')
+# Количество выжимок, хранимых в памяти процесса
+SUMMARY_CACHE_MEMORY_SIZE = 512
+# Время жизни выжимки в кэше, в секундах
+SUMMARY_CACHE_TTL = 7 * 24 * 60 * 60
+
+# Лимиты GigaChat API, под которые подстраивается частота запросов
+REQUESTS_PER_MINUTE = int(os.getenv('GIGACHAT_REQUESTS_PER_MINUTE', '60'))
+TOKENS_PER_MINUTE = int(os.getenv('GIGACHAT_TOKENS_PER_MINUTE', '60000'))
+
+
+# Опции сокетов: TCP_NODELAY (по умолчанию в urllib3) и TCP keep-alive,
+# чтобы простаивающие между выжимками соединения не закрывались по таймауту
+SOCKET_OPTIONS = HTTPConnection.default_socket_options + [
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+]
+if hasattr(socket, 'TCP_KEEPIDLE'):
+    # Linux: первая keep-alive проба после 30 секунд простоя
+    SOCKET_OPTIONS.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 30))
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTP-адаптер, открывающий соединения с SOCKET_OPTIONS."""
+    
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = SOCKET_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
+
+
+def _create_session() -> requests.Session:
+    """
+    Создание HTTP-сессии для запросов к GigaChat API.
+    
+    Сессия переиспользует TCP/TLS-соединения (keep-alive) между запросами
+    и повторяет запросы при временных ошибках сервера.
+    
+    Returns:
+        Настроенный объект requests.Session
+    """
+    session = requests.Session()
+    
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset(['POST']),
+        raise_on_status=False
+    )
+    for url in (OAUTH_URL, CHAT_COMPLETIONS_URL):
+        # Отдельный адаптер (пул соединений) для каждого хоста
+        prefix = url.split('/api/')[0] + '/'
+        session.mount(prefix, KeepAliveAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            pool_block=False,
+            max_retries=retry
+        ))
+    
+    # GigaChat API использует самоподписанные сертификаты
+    session.verify = False
+    session.headers.update({
+        'Accept': 'application/json',
+        # Все алгоритмы сжатия, которые умеет распаковывать urllib3
+        # (br - при установленном brotli)
+        'Accept-Encoding': make_headers(accept_encoding=True)['accept-encoding'],
+        'Connection': 'keep-alive'
+    })
+    return session
+
+
+# Общая сессия для всех запросов к GigaChat API
+_SESSION = _create_session()
+
+# Время жизни токена по умолчанию (если API не вернул expires_at), в секундах
+TOKEN_DEFAULT_TTL = 30 * 60
+# Запас до истечения токена, после которого он запрашивается заново, в секундах
+TOKEN_EXPIRY_MARGIN = 60
+
+# Кэш OAuth токена: токен переиспользуется до истечения срока действия
+_token_cache = {'token': None, 'expires_at': 0.0}
+_token_lock = threading.Lock()
+
 
 class GigaChatError(Exception):
     """Базовое исключение для ошибок GigaChat API."""
@@ -41,13 +146,424 @@ class GigaChatAPIError(GigaChatError):
     pass
 
 
+class RateLimiter:
+    """
+    Проактивный ограничитель частоты запросов к GigaChat API (token bucket).
+    
+    Ведет два «ведра» - запросов и токенов в минуту - и задерживает запрос,
+    пока в обоих не хватит емкости, вместо того чтобы получать 429 и повторять.
+    """
+    
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        """
+        Инициализация ограничителя.
+        
+        Args:
+            requests_per_minute: Допустимое количество запросов в минуту
+            tokens_per_minute: Допустимое количество токенов в минуту
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._available_requests = float(requests_per_minute)
+        self._available_tokens = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+    
+    def _refill(self, now: float):
+        """Пополнение ведер пропорционально прошедшему времени."""
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._available_requests = min(
+            float(self.requests_per_minute),
+            self._available_requests + elapsed * self.requests_per_minute / 60
+        )
+        self._available_tokens = min(
+            float(self.tokens_per_minute),
+            self._available_tokens + elapsed * self.tokens_per_minute / 60
+        )
+    
+    def _reserve(self, tokens: int) -> float:
+        """
+        Попытка занять емкость под один запрос.
+        
+        Args:
+            tokens: Оценка количества токенов в запросе
+            
+        Returns:
+            0, если емкость занята, иначе время ожидания в секундах
+        """
+        # Запрос больше всего ведра иначе ждал бы вечно
+        tokens = min(tokens, self.tokens_per_minute)
+        
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            
+            if self._available_requests >= 1 and self._available_tokens >= tokens:
+                self._available_requests -= 1
+                self._available_tokens -= tokens
+                return 0.0
+            
+            request_wait = (1 - self._available_requests) * 60 / self.requests_per_minute
+            token_wait = (tokens - self._available_tokens) * 60 / self.tokens_per_minute
+            return max(request_wait, token_wait)
+    
+    async def acquire(self, tokens_estimate: int = 0):
+        """
+        Ожидание возможности отправить запрос (для асинхронного кода).
+        
+        Args:
+            tokens_estimate: Оценка количества токенов в запросе
+        """
+        while (wait := self._reserve(tokens_estimate)) > 0:
+            await asyncio.sleep(wait)
+    
+    def acquire_sync(self, tokens_estimate: int = 0):
+        """
+        Ожидание возможности отправить запрос (для синхронного кода).
+        
+        Args:
+            tokens_estimate: Оценка количества токенов в запросе
+        """
+        while (wait := self._reserve(tokens_estimate)) > 0:
+            time.sleep(wait)
+    
+    def update_from_headers(self, headers):
+        """
+        Корректировка ведер по заголовкам ответа API.
+        
+        Retry-After приостанавливает отправку запросов на указанное время,
+        X-RateLimit-Remaining ограничивает оставшуюся емкость ведра запросов.
+        
+        Args:
+            headers: Заголовки HTTP-ответа
+        """
+        retry_after = headers.get('Retry-After')
+        remaining = headers.get('X-RateLimit-Remaining')
+        
+        with self._lock:
+            if retry_after:
+                try:
+                    self._blocked_until = max(
+                        self._blocked_until,
+                        time.monotonic() + float(retry_after)
+                    )
+                    logger.warning(f"GigaChat API просит подождать {retry_after} с перед следующим запросом")
+                except ValueError:
+                    pass
+            
+            if remaining is not None:
+                try:
+                    self._available_requests = min(self._available_requests, float(remaining))
+                except ValueError:
+                    pass
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Грубая оценка количества токенов в тексте (около 3 символов на токен).
+    
+    Args:
+        text: Текст запроса
+        
+    Returns:
+        Оценка количества токенов
+    """
+    return len(text) // 3
+
+
+# Общий ограничитель для всех запросов к chat/completions
+_RATE_LIMITER = RateLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE)
+
+
+class SummaryCache:
+    """
+    Кэш ответов GigaChat по SHA-256 от текста запроса.
+    
+    Хранит последние ответы в памяти (LRU) и все ответы - в таблице summary_cache
+    SQLite, чтобы повторная обработка того же текста не требовала запроса к API
+    и после перезапуска процесса. Соединение с БД открывается при первом обращении
+    и используется всеми потоками под общей блокировкой. Ошибки работы с БД
+    не прерывают генерацию выжимки.
+    """
+    
+    def __init__(self, db_path: Path, memory_size: int, ttl: int):
+        """
+        Инициализация кэша.
+        
+        Args:
+            db_path: Путь к файлу базы данных
+            memory_size: Количество ответов, хранимых в памяти
+            ttl: Время жизни ответа в кэше, в секундах
+        """
+        self.db_path = db_path
+        self.memory_size = memory_size
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+    
+    @staticmethod
+    def make_key(user_message: str, system_message: Optional[str] = None) -> str:
+        """
+        Вычисление ключа кэша для запроса.
+        
+        Args:
+            user_message: Сообщение пользователя
+            system_message: Системное сообщение
+            
+        Returns:
+            SHA-256 от системного и пользовательского сообщений
+        """
+        digest = hashlib.sha256()
+        digest.update((system_message or '').encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(user_message.encode('utf-8'))
+        return digest.hexdigest()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Получение соединения с БД (вызывается под self._lock).
+        При первом обращении соединение открывается, создается таблица кэша
+        и удаляются ответы с истекшим сроком действия.
+        
+        Returns:
+            Соединение с базой данных
+        """
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+            try:
+                with conn:
+                    conn.execute('''
+                        CREATE TABLE IF NOT EXISTS summary_cache (
+                            hash TEXT PRIMARY KEY,
+                            summary TEXT NOT NULL,
+                            created_at INTEGER NOT NULL
+                        )
+                    ''')
+                    conn.execute(
+                        'DELETE FROM summary_cache WHERE created_at < ?',
+                        (int(time.time() - self.ttl),)
+                    )
+            except sqlite3.Error:
+                conn.close()
+                raise
+            self._conn = conn
+        return self._conn
+    
+    def _remember(self, key: str, summary: str, created_at: Optional[float] = None):
+        """
+        Сохранение ответа в памяти с вытеснением самых старых записей.
+        
+        Args:
+            key: Ключ кэша
+            summary: Ответ GigaChat
+            created_at: Время создания ответа (по умолчанию - текущее)
+        """
+        with self._lock:
+            self._memory[key] = (summary, time.time() if created_at is None else created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        Получение ответа из кэша.
+        
+        Args:
+            key: Ключ кэша
+            
+        Returns:
+            Сохраненный ответ или None, если его нет или срок действия истек
+        """
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached and now - cached[1] < self.ttl:
+                self._memory.move_to_end(key)
+                return cached[0]
+        
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    'SELECT summary, created_at FROM summary_cache WHERE hash = ? AND created_at >= ?',
+                    (key, int(now - self.ttl))
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Не удалось прочитать кэш выжимок: {e}")
+            return None
+        
+        if row is None:
+            return None
+        
+        # Время жизни отсчитывается от сохранения ответа в БД
+        self._remember(key, row[0], row[1])
+        return row[0]
+    
+    def set(self, key: str, summary: str):
+        """
+        Сохранение ответа в кэш.
+        
+        Args:
+            key: Ключ кэша
+            summary: Ответ GigaChat
+        """
+        self._remember(key, summary)
+        
+        try:
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.execute(
+                        'INSERT OR REPLACE INTO summary_cache (hash, summary, created_at) VALUES (?, ?, ?)',
+                        (key, summary, int(time.time()))
+                    )
+        except sqlite3.Error as e:
+            logger.warning(f"Не удалось сохранить выжимку в кэш: {e}")
+
+
+# Общий кэш выжимок
+_SUMMARY_CACHE = SummaryCache(SUMMARY_CACHE_DB, SUMMARY_CACHE_MEMORY_SIZE, SUMMARY_CACHE_TTL)
+
+
+def _extract_content(result: dict) -> str:
+    """
+    Извлечение текста ответа из структуры ответа chat/completions.
+    
+    Args:
+        result: Разобранный JSON ответа API
+        
+    Returns:
+        Текст ответа модели
+        
+    Raises:
+        GigaChatAPIError: Если ответ не содержит текста
+    """
+    choices = result.get('choices', [])
+    if not choices:
+        raise GigaChatAPIError("Ответ API не содержит choices")
+    
+    message = choices[0].get('message', {})
+    content = message.get('content', '')
+    
+    if not content:
+        raise GigaChatAPIError("Ответ API не содержит содержимого")
+    
+    return content
+
+
+def _build_payload(user_message: str, system_message: Optional[str] = None) -> dict:
+    """
+    Формирование тела запроса chat/completions.
+    
+    Args:
+        user_message: Сообщение пользователя
+        system_message: Опциональное системное сообщение
+        
+    Returns:
+        Тело запроса
+    """
+    messages = []
+    if system_message:
+        messages.append({
+            "role": "system",
+            "content": system_message
+        })
+    messages.append({
+        "role": "user",
+        "content": user_message
+    })
+    
+    return {
+        "model": "GigaChat",
+        "messages": messages
+    }
+
+
+def _auth_headers() -> dict:
+    """
+    Заголовки запроса к API с действующим токеном доступа.
+    
+    Returns:
+        Словарь заголовков
+        
+    Raises:
+        GigaChatError: Если не удалось получить токен
+    """
+    try:
+        access_token = get_access_token()
+    except GigaChatAuthError as e:
+        raise GigaChatError(f"Ошибка аутентификации: {e}")
+    
+    return {
+        "Authorization": f"Bearer {access_token}",
+        "Content-Type": "application/json"
+    }
+
+
+def _http_error(status: int, details) -> GigaChatAPIError:
+    """
+    Обработка HTTP-ошибки API: сброс токена при 401 и формирование исключения.
+    
+    Args:
+        status: HTTP-статус ответа
+        details: Тело ответа (разобранный JSON или текст)
+        
+    Returns:
+        Исключение для выброса вызывающим кодом
+    """
+    if status == 401:
+        # Токен отозван или истек раньше срока - запросим новый при следующем вызове
+        invalidate_token()
+    error_msg = f"HTTP ошибка: {status} - {details}"
+    logger.error(error_msg)
+    return GigaChatAPIError(error_msg)
+
+
 def get_access_token() -> str:
     """
     Получение OAuth токена для доступа к GigaChat API.
+    Токен кэшируется и запрашивается заново только после истечения срока действия.
     
     Returns:
         Access token для использования в API запросах
         
+    Raises:
+        GigaChatAuthError: Если не удалось получить токен
+    """
+    # Блокировка не дает параллельным вызовам одновременно запрашивать новый токен
+    with _token_lock:
+        if _token_cache['token'] and time.time() < _token_cache['expires_at']:
+            logger.debug("Используется кэшированный токен доступа")
+            return _token_cache['token']
+        
+        access_token, expires_at = _request_access_token()
+        _token_cache['token'] = access_token
+        _token_cache['expires_at'] = expires_at - TOKEN_EXPIRY_MARGIN
+        return access_token
+
+
+def invalidate_token():
+    """
+    Сброс кэшированного токена доступа.
+    Вызывается при ответе API 401, чтобы следующий запрос получил новый токен.
+    """
+    with _token_lock:
+        _token_cache['token'] = None
+        _token_cache['expires_at'] = 0.0
+
+
+def _request_access_token() -> Tuple[str, float]:
+    """
+    Запрос нового OAuth токена у GigaChat API.
+    
+    Returns:
+        Кортеж (access token, время истечения в секундах Unix)
+        
     Raises:
         GigaChatAuthError: Если не удалось получить токен
     """
@@ -79,10 +595,9 @@ def get_access_token() -> str:
         'scope': 'GIGACHAT_API_PERS'
     }
     
-    # Заголовки для запроса
+    # Заголовки для запроса (Accept задан в сессии)
     headers = {
         'Content-Type': 'application/x-www-form-urlencoded',
-        'Accept': 'application/json',
         'RqUID': client_id,
         'Authorization': authorization
     }
@@ -93,13 +608,11 @@ def get_access_token() -> str:
         logger.debug(f"RqUID: {client_id}")
         logger.debug(f"Authorization: {authorization[:50]}...")  # Показываем первые 50 символов
         
-        # Отключаем проверку SSL для работы с GigaChat API
-        response = requests.post(
+        response = _SESSION.post(
             OAUTH_URL,
             headers=headers,
             data=payload,  # Используем data, а не json
-            timeout=10,
-            verify=False  # Отключаем проверку SSL сертификата
+            timeout=10
         )
         
         # Логируем детали ошибки, если запрос неудачен
@@ -107,14 +620,21 @@ def get_access_token() -> str:
             logger.error(f"HTTP {response.status_code}: {response.text}")
         
         response.raise_for_status()
-        token_data = response.json()
+        token_data = orjson.loads(response.content)
         
         access_token = token_data.get('access_token')
         if not access_token:
             raise GigaChatAuthError("Токен доступа не найден в ответе API")
         
+        # expires_at возвращается в миллисекундах Unix
+        expires_at = token_data.get('expires_at')
+        if expires_at:
+            expires_at = expires_at / 1000
+        else:
+            expires_at = time.time() + TOKEN_DEFAULT_TTL
+        
         logger.info("Токен доступа успешно получен")
-        return access_token
+        return access_token, expires_at
         
     except requests.exceptions.HTTPError as e:
         error_msg = f"HTTP {e.response.status_code}: {e.response.text}"
@@ -128,13 +648,18 @@ def get_access_token() -> str:
         raise GigaChatAuthError(f"Ошибка при получении токена: {e}")
 
 
-def chat_completion(user_message: str, system_message: Optional[str] = None) -> str:
+def chat_completion(
+    user_message: str,
+    system_message: Optional[str] = None,
+    use_cache: bool = False
+) -> str:
     """
     Отправка сообщения в GigaChat API и получение ответа.
     
     Args:
         user_message: Сообщение пользователя
         system_message: Опциональное системное сообщение для настройки поведения ассистента
+        use_cache: Вернуть сохраненный ответ, если такой же запрос уже выполнялся
         
     Returns:
         Ответ от GigaChat
@@ -145,75 +670,52 @@ def chat_completion(user_message: str, system_message: Optional[str] = None) ->
     if not user_message or not user_message.strip():
         raise ValueError("Сообщение пользователя не может быть пустым")
     
-    # Получаем токен доступа
-    try:
-        access_token = get_access_token()
-    except GigaChatAuthError as e:
-        raise GigaChatError(f"Ошибка аутентификации: {e}")
-    
-    # Подготовка запроса
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
+    cache_key = None
+    if use_cache:
+        cache_key = SummaryCache.make_key(user_message, system_message)
+        cached = _SUMMARY_CACHE.get(cache_key)
+        if cached:
+            logger.info("Ответ найден в кэше, запрос к GigaChat API не выполняется")
+            return cached
     
-    # Формируем список сообщений
-    messages = []
-    if system_message:
-        messages.append({
-            "role": "system",
-            "content": system_message
-        })
-    messages.append({
-        "role": "user",
-        "content": user_message
-    })
-    
-    payload = {
-        "model": "GigaChat",
-        "messages": messages
-    }
+    headers = _auth_headers()
+    payload = _build_payload(user_message, system_message)
     
     try:
+        _RATE_LIMITER.acquire_sync(
+            estimate_tokens(user_message) + estimate_tokens(system_message or '')
+        )
         logger.info("Отправка запроса в GigaChat API...")
-        # Отключаем проверку SSL для работы с GigaChat API
-        response = requests.post(
+        response = _SESSION.post(
             CHAT_COMPLETIONS_URL,
-            json=payload,
+            data=orjson.dumps(payload),
             headers=headers,
-            timeout=30,
-            verify=False  # Отключаем проверку SSL сертификата
+            timeout=30
         )
+        _RATE_LIMITER.update_from_headers(response.headers)
         
         response.raise_for_status()
-        result = response.json()
+        result = orjson.loads(response.content)
         
         # Извлекаем ответ из структуры ответа API
-        choices = result.get('choices', [])
-        if not choices:
-            raise GigaChatAPIError("Ответ API не содержит choices")
-        
-        message = choices[0].get('message', {})
-        content = message.get('content', '')
-        
-        if not content:
-            raise GigaChatAPIError("Ответ API не содержит содержимого")
+        content = _extract_content(result)
         
         logger.info("Ответ успешно получен от GigaChat API")
+        if cache_key:
+            _SUMMARY_CACHE.set(cache_key, content)
         return content
         
     except requests.exceptions.HTTPError as e:
-        error_msg = f"HTTP ошибка: {e.response.status_code}"
         try:
-            error_data = e.response.json()
-            error_msg += f" - {error_data}"
-        except:
-            error_msg += f" - {e.response.text}"
-        logger.error(error_msg)
-        raise GigaChatAPIError(error_msg)
+            details = e.response.json()
+        except ValueError:
+            details = e.response.text
+        raise _http_error(e.response.status_code, details)
     except requests.exceptions.RequestException as e:
         logger.error(f"Ошибка при запросе к API: {e}")
         raise GigaChatAPIError(f"Ошибка при запросе к API: {e}")
+    except GigaChatError:
+        raise
     except Exception as e:
         logger.error(f"Неожиданная ошибка: {e}")
         raise GigaChatAPIError(f"Неожиданная ошибка: {e}")
@@ -235,73 +737,92 @@ def generate_summary(text: str) -> str:
     if not text or not text.strip():
         raise ValueError("Текст не может быть пустым")
     
-    # Получаем токен доступа
-    try:
-        access_token = get_access_token()
-    except GigaChatAuthError as e:
-        raise GigaChatError(f"Ошибка аутентификации: {e}")
+    # Тот же текст уже обрабатывался - вернется сохраненная выжимка
+    return chat_completion(text, SUMMARY_SYSTEM_MESSAGE, use_cache=True)
+
+
+async def generate_summary_async(text: str, session: aiohttp.ClientSession) -> str:
+    """
+    Асинхронная генерация краткой выжимки текста через GigaChat API.
     
-    # Подготовка запроса
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
+    Args:
+        text: Текст для обработки
+        session: Сессия aiohttp, через которую выполняется запрос
+        
+    Returns:
+        Краткая выжимка текста
+        
+    Raises:
+        GigaChatError: При ошибках работы с API
+    """
+    if not text or not text.strip():
+        raise ValueError("Текст не может быть пустым")
     
-    payload = {
-        "model": "GigaChat",
-        "messages": [
-            {
-                "role": "system",
-                "content": "Ты – ассистент, который делает краткие выжимки текста."
-            },
-            {
-                "role": "user",
-                "content": text
-            }
-        ]
-    }
+    # Обращения к кэшу выполняются в потоке: кэш может читать SQLite
+    cache_key = SummaryCache.make_key(text, SUMMARY_SYSTEM_MESSAGE)
+    cached = await asyncio.to_thread(_SUMMARY_CACHE.get, cache_key)
+    if cached:
+        return cached
+    
+    # Токен кэшируется, поэтому все задачи пакета используют один и тот же токен;
+    # запрос выполняется в потоке, чтобы не блокировать event loop
+    headers = await asyncio.to_thread(_auth_headers)
+    payload = _build_payload(text, SUMMARY_SYSTEM_MESSAGE)
     
     try:
-        logger.info("Отправка запроса на генерацию выжимки...")
-        # Отключаем проверку SSL для работы с GigaChat API
-        response = requests.post(
-            CHAT_COMPLETIONS_URL,
-            json=payload,
-            headers=headers,
-            timeout=30,
-            verify=False  # Отключаем проверку SSL сертификата
-        )
-        
-        response.raise_for_status()
-        result = response.json()
+        await _RATE_LIMITER.acquire(estimate_tokens(text) + estimate_tokens(SUMMARY_SYSTEM_MESSAGE))
+        async with session.post(CHAT_COMPLETIONS_URL, data=orjson.dumps(payload), headers=headers) as response:
+            _RATE_LIMITER.update_from_headers(response.headers)
+            if response.status != 200:
+                raise _http_error(response.status, await response.text())
+            
+            result = orjson.loads(await response.read())
         
-        # Извлекаем ответ из структуры ответа API
-        choices = result.get('choices', [])
-        if not choices:
-            raise GigaChatAPIError("Ответ API не содержит choices")
-        
-        message = choices[0].get('message', {})
-        summary = message.get('content', '')
-        
-        if not summary:
-            raise GigaChatAPIError("Ответ API не содержит содержимого")
-        
-        logger.info("Выжимка успешно сгенерирована")
+        summary = _extract_content(result)
+        await asyncio.to_thread(_SUMMARY_CACHE.set, cache_key, summary)
         return summary
         
-    except requests.exceptions.HTTPError as e:
-        error_msg = f"HTTP ошибка: {e.response.status_code}"
-        try:
-            error_data = e.response.json()
-            error_msg += f" - {error_data}"
-        except:
-            error_msg += f" - {e.response.text}"
-        logger.error(error_msg)
-        raise GigaChatAPIError(error_msg)
-    except requests.exceptions.RequestException as e:
+    except aiohttp.ClientError as e:
         logger.error(f"Ошибка при запросе к API: {e}")
         raise GigaChatAPIError(f"Ошибка при запросе к API: {e}")
-    except Exception as e:
-        logger.error(f"Неожиданная ошибка: {e}")
-        raise GigaChatAPIError(f"Неожиданная ошибка: {e}")
+    except asyncio.TimeoutError:
+        logger.error("Превышено время ожидания ответа API")
+        raise GigaChatAPIError("Превышено время ожидания ответа API")
 
+
+async def generate_summaries_batch(texts: List[str]) -> List[Optional[str]]:
+    """
+    Параллельная генерация выжимок для набора текстов.
+    Запросы выполняются одновременно, но не более BATCH_CONCURRENCY за раз.
+    
+    Args:
+        texts: Список текстов для обработки
+        
+    Returns:
+        Список выжимок в порядке исходных текстов;
+        None для текстов, выжимку которых получить не удалось
+    """
+    if not texts:
+        return []
+    
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    connector = aiohttp.TCPConnector(limit_per_host=BATCH_CONCURRENCY, ssl=False)
+    timeout = aiohttp.ClientTimeout(total=30)
+    
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                     headers={'Accept': 'application/json'}) as session:
+        async def _summarise(index: int, text: str) -> Optional[str]:
+            async with semaphore:
+                try:
+                    return await generate_summary_async(text, session)
+                except (GigaChatError, ValueError) as e:
+                    logger.error(f"Не удалось сгенерировать выжимку для текста #{index}: {e}")
+                    return None
+        
+        logger.info(f"Генерация {len(texts)} выжимок (до {BATCH_CONCURRENCY} параллельно)...")
+        summaries = await asyncio.gather(
+            *(_summarise(i, text) for i, text in enumerate(texts))
+        )
+    
+    logger.info(f"Сгенерировано {sum(1 for s in summaries if s)} из {len(texts)} выжимок")
+    return list(summaries)
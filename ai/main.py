@@ -4,10 +4,11 @@ CLI-приложение для работы с GigaChat API.
 """
 
 import argparse
+import asyncio
 import logging
 import sys
 
-from gigachat import generate_summary, GigaChatError
+from gigachat import generate_summary, generate_summaries_batch, GigaChatError
 from utils import read_text_from_file, validate_text
 
 # Настройка логирования
@@ -39,13 +40,15 @@ def main():
     summary_parser.add_argument(
         '--file',
         type=str,
-        help='Путь к файлу с текстом для обработки'
+        action='append',
+        help='Путь к файлу с текстом для обработки (можно указать несколько раз)'
     )
     
     summary_parser.add_argument(
         '--text',
         type=str,
-        help='Текст для обработки (приоритет над --file)'
+        action='append',
+        help='Текст для обработки (приоритет над --file, можно указать несколько раз)'
     )
     
     # Парсим аргументы
@@ -58,44 +61,53 @@ def main():
     
     # Обработка команды summary
     if args.command == 'summary':
-        text = None
+        texts = []
         
         # Приоритет у --text
         if args.text:
-            text = args.text
+            texts = args.text
             logger.info("Используется текст из аргумента --text")
         elif args.file:
-            try:
-                text = read_text_from_file(args.file)
-                logger.info(f"Текст прочитан из файла: {args.file}")
-            except FileNotFoundError as e:
-                print(f"Ошибка: {e}", file=sys.stderr)
-                sys.exit(1)
-            except IOError as e:
-                print(f"Ошибка при чтении файла: {e}", file=sys.stderr)
-                sys.exit(1)
+            for file_path in args.file:
+                try:
+                    texts.append(read_text_from_file(file_path))
+                    logger.info(f"Текст прочитан из файла: {file_path}")
+                except FileNotFoundError as e:
+                    print(f"Ошибка: {e}", file=sys.stderr)
+                    sys.exit(1)
+                except IOError as e:
+                    print(f"Ошибка при чтении файла: {e}", file=sys.stderr)
+                    sys.exit(1)
         else:
             print("Ошибка: необходимо указать либо --file, либо --text", file=sys.stderr)
             summary_parser.print_help()
             sys.exit(1)
         
         # Проверяем валидность текста
-        if not validate_text(text):
+        if not all(validate_text(text) for text in texts):
             print("Ошибка: текст не может быть пустым", file=sys.stderr)
             sys.exit(1)
         
         # Генерируем выжимку
         try:
             logger.info("Начало генерации выжимки...")
-            summary = generate_summary(text)
+            if len(texts) == 1:
+                summaries = [generate_summary(texts[0])]
+            else:
+                # Несколько текстов обрабатываются параллельно
+                summaries = asyncio.run(generate_summaries_batch(texts))
             
             # Выводим результат
-            print("\n" + "=" * 60)
-            print("ВЫЖИМКА ТЕКСТА:")
-            print("=" * 60)
-            print(summary)
-            print("=" * 60 + "\n")
+            for summary in summaries:
+                print("\n" + "=" * 60)
+                print("ВЫЖИМКА ТЕКСТА:")
+                print("=" * 60)
+                print(summary if summary else "Не удалось сгенерировать выжимку")
+                print("=" * 60 + "\n")
             
+            if not all(summaries):
+                logger.error("Не для всех текстов удалось сгенерировать выжимку")
+                sys.exit(1)
             logger.info("Выжимка успешно сгенерирована и выведена")
             
         except GigaChatError as e:
@@ -2,13 +2,17 @@
 Вспомогательные функции для работы с текстом и файлами.
 """
 
-import os
+from pathlib import Path
 from typing import Optional
 
+# Кодировки, в которых пробуем декодировать файл (в порядке приоритета)
+TEXT_ENCODINGS = ('utf-8', 'cp1251', 'latin-1')
+
 
 def read_text_from_file(file_path: str) -> str:
     """
     Чтение текста из файла.
+    Файл читается с диска один раз, затем декодируется в одной из поддерживаемых кодировок.
     
     Args:
         file_path: Путь к файлу
@@ -20,25 +24,20 @@ def read_text_from_file(file_path: str) -> str:
         FileNotFoundError: Если файл не найден
         IOError: Если произошла ошибка при чтении файла
     """
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"Файл не найден: {file_path}")
-    
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        return content
-    except UnicodeDecodeError:
-        # Пробуем другие кодировки
-        for encoding in ['cp1251', 'latin-1']:
-            try:
-                with open(file_path, 'r', encoding=encoding) as f:
-                    content = f.read()
-                return content
-            except UnicodeDecodeError:
-                continue
-        raise IOError(f"Не удалось прочитать файл {file_path}: неверная кодировка")
+        data = Path(file_path).read_bytes()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Файл не найден: {file_path}")
     except Exception as e:
         raise IOError(f"Ошибка при чтении файла {file_path}: {e}")
+    
+    # Пробуем кодировки по очереди
+    for encoding in TEXT_ENCODINGS:
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    raise IOError(f"Не удалось прочитать файл {file_path}: неверная кодировка")
 
 
 def validate_text(text: str) -> bool:
@@ -51,11 +50,7 @@ def validate_text(text: str) -> bool:
     Returns:
         True если текст валиден, False иначе
     """
-    if not text:
-        return False
-    
-    if not text.strip():
-        return False
-    
-    return True
+    # isspace() останавливается на первом непробельном символе и не копирует строку,
+    # в отличие от strip(); для пустой строки isspace() возвращает False
+    return bool(text) and not text.isspace()
 
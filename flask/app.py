@@ -3,24 +3,52 @@ Flask приложение для дашборда сообщений Telegram.
 Отображает статистику и список сообщений.
 """
 
-from flask import Flask, render_template
+from flask import Flask, render_template, stream_template
+from flask_caching import Cache
+from flask_compress import Compress
 from flask_db import MessagesDB
 from datetime import datetime
+from functools import lru_cache
 import pytz
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
+app.config['CACHE_TYPE'] = 'SimpleCache'
+
+# Кэш ответов (в памяти процесса) и gzip-сжатие ответов.
+# По умолчанию Flask-Compress не сжимает потоковые ответы gzip, поэтому
+# страница /messages (stream_template) без этой настройки уходила бы клиентам,
+# поддерживающим только gzip, несжатой
+app.config['COMPRESS_ALGORITHM_STREAMING'] = ['zstd', 'br', 'gzip', 'deflate']
+cache = Cache(app)
+Compress(app)
 
 # Инициализация базы данных
 db = MessagesDB()
 
+# Часовые пояса создаются один раз при импорте модуля
+MSK_TZ = pytz.timezone('Europe/Moscow')
+UTC_TZ = pytz.UTC
+
+# Форматы даты/времени, которые не разбираются datetime.fromisoformat
+DATE_FORMATS = [
+    '%Y-%m-%d %H:%M:%S%z',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S%z',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S.%f%z',
+    '%Y-%m-%dT%H:%M:%S.%f',
+]
+
 
+@lru_cache(maxsize=4096)
 def convert_to_msk(dt_string):
     """
-    Конвертация строки даты/времени в часовой пояс MSK (UTC+3).
+    Конвертация даты/времени в часовой пояс MSK (UTC+3).
+    Результат кэшируется: у сообщений часто совпадают временные метки.
     
     Args:
-        dt_string: Строка с датой/временем в формате ISO
+        dt_string: Unix-время в секундах или строка с датой/временем в формате ISO
         
     Returns:
         Строка с датой/временем в MSK
@@ -29,49 +57,40 @@ def convert_to_msk(dt_string):
         return None
     
     try:
-        dt_str = str(dt_string).strip()
-        msk_tz = pytz.timezone('Europe/Moscow')
-        
-        # Пробуем разные форматы
-        formats = [
-            '%Y-%m-%d %H:%M:%S%z',
-            '%Y-%m-%d %H:%M:%S',
-            '%Y-%m-%dT%H:%M:%S%z',
-            '%Y-%m-%dT%H:%M:%S',
-            '%Y-%m-%dT%H:%M:%S.%f%z',
-            '%Y-%m-%dT%H:%M:%S.%f',
-        ]
+        if isinstance(dt_string, (int, float)):
+            # Дата хранится в БД как unix-время (UTC)
+            dt_msk = datetime.fromtimestamp(dt_string, UTC_TZ).astimezone(MSK_TZ)
+            return dt_msk.strftime('%Y-%m-%d %H:%M:%S MSK')
         
-        dt = None
-        for fmt in formats:
-            try:
-                if '%z' in fmt:
-                    # С timezone
-                    dt = datetime.strptime(dt_str.replace('Z', '+00:00'), fmt)
-                else:
-                    # Без timezone - предполагаем UTC
-                    dt = datetime.strptime(dt_str.split('+')[0].split('Z')[0].split('.')[0], fmt)
-                    dt = pytz.UTC.localize(dt)
-                break
-            except (ValueError, AttributeError):
-                continue
+        dt_str = str(dt_string).strip()
         
-        # Если не удалось распарсить, пробуем fromisoformat
-        if dt is None:
-            try:
-                dt_str_clean = dt_str.replace('Z', '+00:00')
-                if '+' not in dt_str_clean and 'T' in dt_str_clean:
-                    dt_str_clean = dt_str_clean + '+00:00'
-                dt = datetime.fromisoformat(dt_str_clean)
-            except (ValueError, AttributeError):
+        try:
+            # Быстрый путь: ISO формат, в котором sqlite3 сохраняет datetime
+            dt = datetime.fromisoformat(dt_str.replace('Z', '+00:00'))
+        except ValueError:
+            # Пробуем другие форматы
+            dt = None
+            for fmt in DATE_FORMATS:
+                try:
+                    if '%z' in fmt:
+                        # С timezone
+                        dt = datetime.strptime(dt_str.replace('Z', '+00:00'), fmt)
+                    else:
+                        # Без timezone - предполагаем UTC
+                        dt = datetime.strptime(dt_str.split('+')[0].split('Z')[0].split('.')[0], fmt)
+                    break
+                except ValueError:
+                    continue
+            
+            if dt is None:
                 return str(dt_string)
         
         # Если нет timezone, предполагаем UTC
         if dt.tzinfo is None:
-            dt = pytz.UTC.localize(dt)
+            dt = UTC_TZ.localize(dt)
         
         # Конвертируем в MSK
-        dt_msk = dt.astimezone(msk_tz)
+        dt_msk = dt.astimezone(MSK_TZ)
         
         # Форматируем для отображения
         return dt_msk.strftime('%Y-%m-%d %H:%M:%S MSK')
@@ -80,7 +99,13 @@ def convert_to_msk(dt_string):
         return str(dt_string)
 
 
+def is_successful(response):
+    """Кэшируются только успешные ответы, страницы с ошибкой - нет."""
+    return not (isinstance(response, tuple) and response[1] != 200)
+
+
 @app.route('/')
+@cache.cached(timeout=30, response_filter=is_successful)
 def index():
     """Главная страница со статистикой."""
     try:
@@ -109,21 +134,23 @@ def index():
 
 @app.route('/messages')
 def messages():
-    """Страница со списком всех сообщений."""
+    """
+    Страница со списком всех сообщений.
+    Не кэшируется: страница отдается потоком и не хранится целиком в памяти.
+    """
     try:
-        # Получаем все сообщения
-        all_messages = db.get_all_messages()
-        
-        # Конвертируем даты в MSK
-        for msg in all_messages:
-            msg['date_msk'] = convert_to_msk(msg.get('date'))
-            msg['is_processed'] = msg.get('is_summarised', 0) == 1
+        total_messages = db.get_message_count()
         
-        return render_template('messages.html', messages=all_messages)
+        # Страница отдается потоком: сообщения читаются из БД и рендерятся по одному,
+        # дата в MSK уже вычислена в SQL-запросе
+        return stream_template('messages.html',
+                               messages=db.get_all_messages(),
+                               total_messages=total_messages)
     except Exception as e:
         return f"Ошибка: {e}", 500
 
 
 if __name__ == '__main__':
+    # Сервер разработки; в production запускайте через gunicorn (см. README.md)
     app.run(debug=True, host='0.0.0.0', port=5000)
 
@@ -4,12 +4,36 @@
 
 import sqlite3
 import os
+import threading
+import zlib
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Dict, Iterator, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Настройки соединения, применяемые один раз при его открытии
+# (page_size действует только для нового файла БД и задается до journal_mode)
+CONNECTION_PRAGMAS = """
+    PRAGMA page_size=8192;
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA mmap_size=268435456;
+    PRAGMA cache_size=-65536;
+"""
+
+
+def _decompress_text(data: Optional[bytes]) -> Optional[str]:
+    """Распаковка текста сообщения, сжатого скриптом сбора (zlib). SQL-функция unz."""
+    return zlib.decompress(data).decode('utf-8') if data is not None else None
+
+
+# Длинные тексты скрипт сбора хранит сжатыми в text_z (колонка text для них NULL).
+# Схемой управляет скрипт сбора (telethon/db.py): пока он не добавил колонку text_z,
+# читается только text
+TEXT_EXPR_Z = 'COALESCE(text, unz(text_z))'
+TEXT_EXPR_PLAIN = 'text'
+
 
 class MessagesDB:
     """Класс для работы с базой данных сообщений."""
@@ -25,8 +49,45 @@ class MessagesDB:
         current_dir = Path(__file__).parent
         project_root = current_dir.parent
         self.db_path = project_root / db_name
+        # Соединение с БД хранится отдельно для каждого потока
+        self._local = threading.local()
+        # Есть ли в таблице колонка text_z (проверяется, пока ее нет: скрипт
+        # сбора может добавить ее во время работы приложения)
+        self._has_text_z = False
         logger.info(f"База данных: {self.db_path}")
     
+    def _conn(self) -> sqlite3.Connection:
+        """
+        Получение соединения с базой данных для текущего потока.
+        Соединение создается при первом обращении и затем переиспользуется.
+        
+        Returns:
+            Соединение с базой данных
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.create_function('unz', 1, _decompress_text, deterministic=True)
+            conn.executescript(CONNECTION_PRAGMAS)
+            self._local.conn = conn
+        return conn
+    
+    def _text_expr(self, conn: sqlite3.Connection) -> str:
+        """
+        Выражение для текста сообщения в запросах с учетом колонки text_z.
+        
+        Args:
+            conn: Соединение с базой данных
+            
+        Returns:
+            TEXT_EXPR_Z, если колонка text_z есть, иначе TEXT_EXPR_PLAIN
+        """
+        if not self._has_text_z:
+            columns = {col[1] for col in conn.execute('PRAGMA table_info(messages)')}
+            self._has_text_z = 'text_z' in columns
+        return TEXT_EXPR_Z if self._has_text_z else TEXT_EXPR_PLAIN
+    
     def get_message_count(self) -> int:
         """
         Получение общего количества сообщений в базе.
@@ -34,8 +95,7 @@ class MessagesDB:
         Returns:
             Количество сообщений
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._conn().cursor()
         
         try:
             cursor.execute('SELECT COUNT(*) FROM messages')
@@ -45,7 +105,7 @@ class MessagesDB:
             logger.error(f"Ошибка при подсчете сообщений: {e}")
             return 0
         finally:
-            conn.close()
+            cursor.close()
     
     def get_statistics(self) -> Dict:
         """
@@ -54,34 +114,34 @@ class MessagesDB:
         Returns:
             Словарь со статистикой
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._conn().cursor()
         
         try:
-            stats = {}
-            
-            # Количество каналов (type = 'Channel')
-            cursor.execute("SELECT COUNT(DISTINCT chat_id) FROM messages WHERE type = 'Channel'")
-            stats['channels'] = cursor.fetchone()[0]
-            
-            # Количество чатов (type = 'Chat')
-            cursor.execute("SELECT COUNT(DISTINCT chat_id) FROM messages WHERE type = 'Chat'")
-            stats['chats'] = cursor.fetchone()[0]
-            
-            # Количество обработанных сообщений (is_summarised = 1)
-            cursor.execute("SELECT COUNT(*) FROM messages WHERE is_summarised = 1")
-            stats['processed'] = cursor.fetchone()[0]
-            
-            # Количество необработанных сообщений (is_summarised = 0)
-            cursor.execute("SELECT COUNT(*) FROM messages WHERE is_summarised = 0")
-            stats['not_processed'] = cursor.fetchone()[0]
+            # Все показатели считаются за один проход по индексу idx_type_summ
+            # (создается скриптом сбора, telethon/db.py):
+            # количество каналов (type = 'Channel'), чатов (type = 'Chat'),
+            # обработанных (is_summarised = 1) и необработанных (is_summarised = 0) сообщений
+            cursor.execute('''
+                SELECT
+                    COUNT(DISTINCT CASE WHEN type = 'Channel' THEN chat_id END),
+                    COUNT(DISTINCT CASE WHEN type = 'Chat' THEN chat_id END),
+                    COALESCE(SUM(is_summarised = 1), 0),
+                    COALESCE(SUM(is_summarised = 0), 0)
+                FROM messages
+            ''')
+            channels, chats, processed, not_processed = cursor.fetchone()
             
-            return stats
+            return {
+                'channels': channels,
+                'chats': chats,
+                'processed': processed,
+                'not_processed': not_processed
+            }
         except Exception as e:
             logger.error(f"Ошибка при получении статистики: {e}")
             return {'channels': 0, 'chats': 0, 'processed': 0, 'not_processed': 0}
         finally:
-            conn.close()
+            cursor.close()
     
     def get_last_summary_info(self) -> Optional[Dict]:
         """
@@ -90,11 +150,11 @@ class MessagesDB:
         Returns:
             Словарь с информацией о последней выжимке или None
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._conn().cursor()
         
         try:
             # Получаем последнее обработанное сообщение (самое новое с is_summarised = 1)
+            # по частичному индексу idx_summarised_date (telethon/db.py)
             cursor.execute('''
                 SELECT date
                 FROM messages
@@ -113,54 +173,49 @@ class MessagesDB:
             logger.error(f"Ошибка при получении информации о последней выжимке: {e}")
             return None
         finally:
-            conn.close()
+            cursor.close()
     
-    def get_all_messages(self, limit: Optional[int] = None) -> List[Dict]:
+    def get_all_messages(self, limit: Optional[int] = None) -> Iterator[Dict]:
         """
         Получение всех сообщений из базы данных.
+        Сообщения читаются из курсора по одному, без загрузки всей выборки в память.
+        Дата в MSK (date_msk) и статус обработки (is_processed) вычисляются в SQL,
+        там же распаковываются длинные тексты, хранящиеся сжатыми в text_z.
         
         Args:
             limit: Ограничение количества сообщений (если None - все)
             
-        Returns:
-            Список словарей с информацией о сообщениях
+        Yields:
+            Словари с информацией о сообщениях
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        conn = self._conn()
         cursor = conn.cursor()
         
         try:
+            text_expr = self._text_expr(conn)
             if limit:
-                cursor.execute('''
-                    SELECT id, chat_id, sender, type, text, date, is_summarised
+                cursor.execute(f'''
+                    SELECT id, chat_id, sender, type, {text_expr} AS text, date, is_summarised,
+                           strftime('%Y-%m-%d %H:%M:%S', date, 'unixepoch', '+3 hours') || ' MSK' AS date_msk,
+                           is_summarised = 1 AS is_processed
                     FROM messages
                     ORDER BY date DESC, id DESC, chat_id DESC
                     LIMIT ?
                 ''', (limit,))
             else:
-                cursor.execute('''
-                    SELECT id, chat_id, sender, type, text, date, is_summarised
+                cursor.execute(f'''
+                    SELECT id, chat_id, sender, type, {text_expr} AS text, date, is_summarised,
+                           strftime('%Y-%m-%d %H:%M:%S', date, 'unixepoch', '+3 hours') || ' MSK' AS date_msk,
+                           is_summarised = 1 AS is_processed
                     FROM messages
                     ORDER BY date DESC, id DESC, chat_id DESC
                 ''')
             
-            rows = cursor.fetchall()
-            messages = []
-            for row in rows:
-                messages.append({
-                    'id': row['id'],
-                    'chat_id': row['chat_id'],
-                    'sender': row['sender'],
-                    'type': row['type'],
-                    'text': row['text'] or '',
-                    'date': row['date'],
-                    'is_summarised': row['is_summarised']
-                })
-            
-            return messages
+            for row in cursor:
+                message = dict(row)
+                message['text'] = message['text'] or ''
+                yield message
         except Exception as e:
             logger.error(f"Ошибка при получении сообщений: {e}")
-            return []
         finally:
-            conn.close()
-
+            cursor.close()
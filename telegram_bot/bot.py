@@ -3,6 +3,7 @@ Telegram бот с интеграцией GigaChat API.
 Отвечает на вопросы пользователей с помощью GigaChat.
 """
 
+import asyncio
 import telebot
 import logging
 from dotenv import load_dotenv
@@ -84,8 +85,9 @@ def handle_summary_command(message):
         # Отправляем индикатор печати
         bot.send_chat_action(message.chat.id, 'typing')
         
-        # Получаем саммари
-        summary, message_count = generate_summary_from_db()
+        # Получаем саммари (обработчики telebot синхронные и выполняются в потоках
+        # бота, поэтому корутина запускается в собственном event loop)
+        summary, message_count = asyncio.run(generate_summary_from_db())
         
         if summary:
             response = f"📊 <b>Саммари новых сообщений</b>\n\n"
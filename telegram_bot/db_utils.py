@@ -5,13 +5,150 @@
 
 import sqlite3
 import os
+import queue
+import threading
+import zlib
+from collections import Counter, defaultdict
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Настройки, применяемые к каждому соединению при его открытии
+CONNECTION_PRAGMAS = """
+    PRAGMA busy_timeout=5000;
+    PRAGMA cache_size=-20000;
+    PRAGMA temp_store=memory;
+    PRAGMA mmap_size=268435456;
+"""
+
+# Дополнительные настройки соединения на запись
+# (page_size действует только для нового файла БД и задается до journal_mode)
+WRITER_PRAGMAS = """
+    PRAGMA page_size=8192;
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+"""
+
+# Версия схемы (PRAGMA user_version), начиная с которой в таблице messages
+# есть колонка is_summarised; миграция выполняется только для более старых БД
+IS_SUMMARISED_SCHEMA_VERSION = 1
+
+# Запросы, выполняемые при каждом обращении к БД. Текст запросов неизменен,
+# поэтому подготовленные выражения берутся из кэша соединения (cached_statements)
+# Шаблон: {text} заменяется на выражение для текста сообщения (TEXT_EXPR_Z или TEXT_EXPR_PLAIN)
+SQL_GET_NEW = '''
+    SELECT id, chat_id, sender, type, {text} AS text, date
+    FROM messages
+    WHERE is_summarised = 0
+    ORDER BY chat_id ASC, date ASC, id ASC
+'''
+# Шаблон: {placeholders} заменяется на список "?, ?, ..." по количеству id
+SQL_MARK = '''
+    UPDATE messages
+    SET is_summarised = 1
+    WHERE chat_id = ? AND id IN ({placeholders})
+'''
+SQL_UPDATE_STATE = '''
+    UPDATE summary_state
+    SET last_processed_date = ?,
+        last_processed_id = ?,
+        last_processed_chat_id = ?,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = (SELECT MAX(id) FROM summary_state)
+'''
+SQL_COUNT = 'SELECT COUNT(*) FROM messages'
+
+# Длинные тексты скрипт сбора хранит сжатыми в text_z (колонка text для них NULL).
+# Схемой управляет скрипт сбора (telethon/db.py): пока он не добавил колонку text_z,
+# читается только text
+TEXT_EXPR_Z = 'COALESCE(text, unz(text_z))'
+TEXT_EXPR_PLAIN = 'text'
+
+# Размер кэша подготовленных выражений на соединение
+CACHED_STATEMENTS = 256
+
+# Максимальное количество id в одном условии IN (...)
+# (с запасом от лимита SQLite в 999 параметров на запрос)
+UPDATE_CHUNK_SIZE = 900
+
+
+def _decompress_text(data: Optional[bytes]) -> Optional[str]:
+    """Распаковка текста сообщения, сжатого скриптом сбора (zlib). SQL-функция unz."""
+    return zlib.decompress(data).decode('utf-8') if data is not None else None
+
+
+class _ConnPool:
+    """
+    Пул соединений с базой данных: одно соединение на запись и несколько
+    соединений только на чтение. В режиме WAL читатели не блокируют запись
+    (в том числе запись новых сообщений скриптом сбора) и друг друга.
+    """
+    
+    def __init__(self, db_path: Path, readers: Optional[int] = None):
+        """
+        Args:
+            db_path: Путь к файлу базы данных
+            readers: Максимальное количество соединений на чтение (по умолчанию - число CPU)
+        """
+        self._db_path = db_path
+        self._writer = self._connect(str(db_path))
+        self._writer.executescript(WRITER_PRAGMAS)
+        self._write_lock = threading.Lock()
+        # Соединения на чтение открываются по мере необходимости и возвращаются в пул
+        self._readers: queue.LifoQueue = queue.LifoQueue()
+        self._reader_slots = threading.BoundedSemaphore(readers or os.cpu_count() or 1)
+    
+    def _connect(self, database: str, uri: bool = False) -> sqlite3.Connection:
+        """Открытие соединения с общими настройками."""
+        conn = sqlite3.connect(database, uri=uri, isolation_level=None, check_same_thread=False,
+                               cached_statements=CACHED_STATEMENTS)
+        conn.row_factory = sqlite3.Row  # Для доступа к колонкам по имени
+        conn.create_function('unz', 1, _decompress_text, deterministic=True)
+        conn.executescript(CONNECTION_PRAGMAS)
+        return conn
+    
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        """Получение соединения только на чтение."""
+        with self._reader_slots:
+            try:
+                conn = self._readers.get_nowait()
+            except queue.Empty:
+                conn = self._connect(f"{self._db_path.resolve().as_uri()}?mode=ro", uri=True)
+            try:
+                yield conn
+            finally:
+                self._readers.put(conn)
+    
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        """
+        Получение соединения на запись с открытой транзакцией.
+        Транзакция фиксируется при выходе из блока и откатывается при ошибке.
+        """
+        with self._write_lock:
+            self._writer.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._writer
+            except BaseException:
+                self._writer.execute('ROLLBACK')
+                raise
+            self._writer.execute('COMMIT')
+    
+    def close(self):
+        """Закрытие всех соединений пула."""
+        with self._write_lock:
+            self._writer.close()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
 
 class MessagesDB:
     """Класс для работы с базой данных сообщений."""
@@ -27,27 +164,58 @@ class MessagesDB:
         current_dir = Path(__file__).parent
         project_root = current_dir.parent
         self.db_path = project_root / db_name
+        # Соединения открываются один раз на весь срок жизни объекта
+        self._pool = _ConnPool(self.db_path)
+        # Есть ли в таблице колонка text_z (проверяется, пока ее нет: скрипт
+        # сбора может добавить ее во время работы бота)
+        self._has_text_z = False
         self._init_db()
         logger.info(f"База данных инициализирована: {self.db_path}")
     
+    def close(self):
+        """Закрытие соединений с базой данных."""
+        self._pool.close()
+    
     def _init_db(self):
         """Инициализация базы данных и создание необходимых таблиц."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._pool.write() as conn:
+            self._create_schema(conn.cursor())
+    
+    def _create_schema(self, cursor: sqlite3.Cursor):
+        """
+        Создание необходимых таблиц и индексов.
         
-        # Проверяем и добавляем колонку is_summarised в таблицу messages, если её нет
-        try:
-            cursor.execute('ALTER TABLE messages ADD COLUMN is_summarised INTEGER DEFAULT 0')
-            # Обновляем существующие записи - помечаем как необработанные
-            cursor.execute('UPDATE messages SET is_summarised = 0 WHERE is_summarised IS NULL')
-            logger.info("Добавлена колонка is_summarised в таблицу messages")
-        except sqlite3.OperationalError:
-            # Колонка уже существует, игнорируем ошибку
-            pass
-        
-        # Создаем индекс для быстрого поиска необработанных сообщений
+        Args:
+            cursor: Курсор соединения с базой данных
+        """
+        # Добавляем колонку is_summarised в таблицу messages, если БД еще не мигрирована.
+        # DEFAULT 0 сразу дает существующим записям значение 0 (необработанные),
+        # поэтому обновлять таблицу не нужно
+        cursor.execute('PRAGMA user_version')
+        if cursor.fetchone()[0] < IS_SUMMARISED_SCHEMA_VERSION:
+            try:
+                cursor.execute('ALTER TABLE messages ADD COLUMN is_summarised INTEGER DEFAULT 0')
+                logger.info("Добавлена колонка is_summarised в таблицу messages")
+            except sqlite3.OperationalError:
+                # Колонка уже существует, игнорируем ошибку
+                pass
+            cursor.execute(f'PRAGMA user_version = {IS_SUMMARISED_SCHEMA_VERSION}')
+        
+        # Индекс по всей колонке is_summarised (два значения) почти не сокращает
+        # поиск и растет вместе с таблицей; его заменяет частичный индекс ниже
+        cursor.execute('DROP INDEX IF EXISTS idx_is_summarised')
+        # Составной индекс для пометки сообщений по (chat_id, id)
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_messages_chat_id ON messages(chat_id, id)
+        ''')
+        # Частичный индекс только по необработанным сообщениям: выборка новых сообщений
+        # идет по нему в порядке ORDER BY запроса (chat_id, date, id), без сортировки
+        # и без просмотра обработанных (is_summarised в ключе, чтобы планировщик выбирал
+        # индекс и без ANALYZE). Заменяет прежний индекс, упорядоченный по date
+        cursor.execute('DROP INDEX IF EXISTS idx_messages_pending')
         cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_is_summarised ON messages(is_summarised)
+            CREATE INDEX IF NOT EXISTS idx_messages_pending_by_chat ON messages(is_summarised, chat_id, date, id)
+            WHERE is_summarised = 0
         ''')
         
         # Создаем таблицу для отслеживания последнего обработанного сообщения (для обратной совместимости)
@@ -68,63 +236,64 @@ class MessagesDB:
                 INSERT INTO summary_state (last_processed_date, last_processed_id, last_processed_chat_id)
                 VALUES (datetime('1970-01-01'), 0, 0)
             ''')
+    
+    def _text_expr(self, conn: sqlite3.Connection) -> str:
+        """
+        Выражение для текста сообщения в запросах с учетом колонки text_z.
         
-        conn.commit()
-        conn.close()
+        Args:
+            conn: Соединение с базой данных
+            
+        Returns:
+            TEXT_EXPR_Z, если колонка text_z есть, иначе TEXT_EXPR_PLAIN
+        """
+        if not self._has_text_z:
+            columns = {col[1] for col in conn.execute('PRAGMA table_info(messages)')}
+            self._has_text_z = 'text_z' in columns
+        return TEXT_EXPR_Z if self._has_text_z else TEXT_EXPR_PLAIN
+    
+    def iter_new_messages(self) -> Iterator[sqlite3.Row]:
+        """
+        Построчное чтение новых сообщений, которые еще не были обработаны,
+        без загрузки всей выборки в память. Сообщения сгруппированы по чатам
+        (упорядочены по chat_id, date, id). Соединение на чтение занято,
+        пока итерация не завершена.
+        
+        Yields:
+            Строки sqlite3.Row с колонками id, chat_id, sender, type, text, date
+        """
+        with self._pool.read() as conn:
+            cursor = conn.cursor()
+            try:
+                # Получаем новые сообщения, которые еще не были обработаны (is_summarised = 0),
+                # сгруппированные по чатам (порядок нужен для группировки при форматировании)
+                cursor.execute(SQL_GET_NEW.format(text=self._text_expr(conn)))
+                yield from cursor
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка при получении новых сообщений: {e}")
+            finally:
+                cursor.close()
     
     def get_new_messages(self) -> List[Dict]:
         """
         Получение всех новых сообщений, которые еще не были обработаны.
         Использует колонку is_summarised для определения необработанных сообщений.
+        Для больших выборок следует использовать iter_new_messages.
         
         Returns:
             Список словарей с информацией о сообщениях
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Для доступа к колонкам по имени
-        cursor = conn.cursor()
+        messages = [dict(row, text=row['text'] or '') for row in self.iter_new_messages()]
         
-        try:
-            # Получаем новые сообщения, которые еще не были обработаны (is_summarised = 0)
-            cursor.execute('''
-                SELECT id, chat_id, sender, type, text, date
-                FROM messages
-                WHERE is_summarised = 0
-                ORDER BY date ASC, id ASC, chat_id ASC
-            ''')
-            
-            rows = cursor.fetchall()
-            messages = []
-            for row in rows:
-                messages.append({
-                    'id': row['id'],
-                    'chat_id': row['chat_id'],
-                    'sender': row['sender'],
-                    'type': row['type'],
-                    'text': row['text'] or '',
-                    'date': row['date']
-                })
-            
-            logger.info(f"Найдено {len(messages)} новых сообщений для суммаризации")
-            
-            # Логируем информацию о чатах
-            if messages:
-                unique_chats = set(msg['chat_id'] for msg in messages)
-                logger.info(f"Сообщения из {len(unique_chats)} уникальных чатов: {list(unique_chats)}")
-                # Логируем количество сообщений по чатам
-                chat_counts = {}
-                for msg in messages:
-                    chat_id = msg['chat_id']
-                    chat_counts[chat_id] = chat_counts.get(chat_id, 0) + 1
-                logger.info(f"Распределение по чатам: {chat_counts}")
-            
-            return messages
-            
-        except Exception as e:
-            logger.error(f"Ошибка при получении новых сообщений: {e}")
-            return []
-        finally:
-            conn.close()
+        logger.info(f"Найдено {len(messages)} новых сообщений для суммаризации")
+        
+        # Логируем информацию о чатах (подсчет за один проход и только при включенном INFO)
+        if messages and logger.isEnabledFor(logging.INFO):
+            chat_counts = Counter(msg['chat_id'] for msg in messages)
+            logger.info(f"Сообщения из {len(chat_counts)} уникальных чатов: {list(chat_counts)}")
+            logger.info(f"Распределение по чатам: {dict(chat_counts)}")
+        
+        return messages
     
     def mark_messages_as_summarised(self, message_ids: List[tuple]):
         """
@@ -136,24 +305,26 @@ class MessagesDB:
         if not message_ids:
             return
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        # Группируем id сообщений по чатам: вместо отдельного UPDATE на каждое
+        # сообщение выполняется один UPDATE на пакет id одного чата
+        ids_by_chat = defaultdict(list)
+        for message_id, chat_id in message_ids:
+            ids_by_chat[chat_id].append(message_id)
         
         try:
-            # Помечаем сообщения как обработанные
-            cursor.executemany('''
-                UPDATE messages
-                SET is_summarised = 1
-                WHERE id = ? AND chat_id = ?
-            ''', message_ids)
+            updated = 0
+            with self._pool.write() as conn:
+                for chat_id, ids in ids_by_chat.items():
+                    for start in range(0, len(ids), UPDATE_CHUNK_SIZE):
+                        chunk = ids[start:start + UPDATE_CHUNK_SIZE]
+                        placeholders = ', '.join('?' * len(chunk))
+                        # Помечаем сообщения как обработанные
+                        cursor = conn.execute(SQL_MARK.format(placeholders=placeholders), (chat_id, *chunk))
+                        updated += cursor.rowcount
             
-            conn.commit()
-            logger.info(f"Помечено {cursor.rowcount} сообщений как обработанные")
+            logger.info(f"Помечено {updated} сообщений как обработанные")
         except Exception as e:
             logger.error(f"Ошибка при пометке сообщений: {e}")
-            conn.rollback()
-        finally:
-            conn.close()
     
     def update_last_processed(self, last_date: str, last_id: int, last_chat_id: int):
         """
@@ -164,25 +335,13 @@ class MessagesDB:
             last_id: ID последнего обработанного сообщения
             last_chat_id: ID чата последнего обработанного сообщения
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute('''
-                UPDATE summary_state
-                SET last_processed_date = ?,
-                    last_processed_id = ?,
-                    last_processed_chat_id = ?,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE id = (SELECT MAX(id) FROM summary_state)
-            ''', (last_date, last_id, last_chat_id))
+            with self._pool.write() as conn:
+                conn.execute(SQL_UPDATE_STATE, (last_date, last_id, last_chat_id))
             
-            conn.commit()
             logger.info(f"Обновлено состояние: дата={last_date}, id={last_id}, chat_id={last_chat_id}")
         except Exception as e:
             logger.error(f"Ошибка при обновлении состояния: {e}")
-        finally:
-            conn.close()
     
     def get_message_count(self) -> int:
         """
@@ -191,16 +350,10 @@ class MessagesDB:
         Returns:
             Количество сообщений
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute('SELECT COUNT(*) FROM messages')
-            count = cursor.fetchone()[0]
-            return count
+            with self._pool.read() as conn:
+                return conn.execute(SQL_COUNT).fetchone()[0]
         except Exception as e:
             logger.error(f"Ошибка при подсчете сообщений: {e}")
             return 0
-        finally:
-            conn.close()
 
@@ -47,14 +47,14 @@ try:
     else:
         print("Добавление колонки is_summarised...")
         
-        # Добавляем колонку
+        # Добавляем колонку; DEFAULT 0 сразу помечает существующие записи как необработанные
         cursor.execute('ALTER TABLE messages ADD COLUMN is_summarised INTEGER DEFAULT 0')
         
-        # Обновляем существующие записи - помечаем как необработанные
-        cursor.execute('UPDATE messages SET is_summarised = 0 WHERE is_summarised IS NULL')
-        
-        # Создаем индекс
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_is_summarised ON messages(is_summarised)')
+        # Создаем частичный индекс по необработанным сообщениям (как в MessagesDB)
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_messages_pending_by_chat ON messages(is_summarised, chat_id, date, id)
+            WHERE is_summarised = 0
+        ''')
         
         conn.commit()
         
@@ -64,6 +64,12 @@ try:
         print(f"  Всего сообщений: {total}")
         print(f"  Все существующие сообщения помечены как необработанные (is_summarised = 0)")
     
+    # Отмечаем миграцию в версии схемы, чтобы MessagesDB не повторял ее при запуске
+    # (версия 1 - IS_SUMMARISED_SCHEMA_VERSION в db_utils.py)
+    cursor.execute('PRAGMA user_version')
+    if cursor.fetchone()[0] < 1:
+        cursor.execute('PRAGMA user_version = 1')
+    
     # Показываем структуру таблицы
     print("\nСтруктура таблицы messages:")
     cursor.execute('PRAGMA table_info(messages)')
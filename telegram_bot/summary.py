@@ -2,95 +2,168 @@
 Модуль для создания саммари (выжимки) из новых сообщений.
 """
 
+import asyncio
+import io
 import logging
-from typing import List, Dict, Optional, Tuple
+from itertools import chain, groupby
+from operator import itemgetter
+from typing import Iterable, List, Mapping, Optional, Tuple
 from telegram_bot.db_utils import MessagesDB
 from ai.gigachat import chat_completion, GigaChatError
 
 logger = logging.getLogger(__name__)
 
+# Ограничение общего размера текста для суммаризации (GigaChat имеет лимиты)
+MAX_SUMMARY_TEXT_LENGTH = 10000  # Примерный лимит
 
-def format_messages_for_summary(messages: List[Dict]) -> str:
+# Общий экземпляр базы данных: соединение открывается один раз за время работы бота
+_db: Optional[MessagesDB] = None
+
+
+def _get_db() -> MessagesDB:
     """
-    Форматирование списка сообщений в текст для суммаризации.
-    Объединяет сообщения из всех чатов в один текст.
+    Получение общего экземпляра MessagesDB (создается при первом обращении).
+    
+    Returns:
+        Экземпляр MessagesDB
+    """
+    global _db
+    if _db is None:
+        _db = MessagesDB()
+    return _db
+
+
+def format_messages_for_summary(messages: Iterable[Mapping],
+                                max_length: int = MAX_SUMMARY_TEXT_LENGTH,
+                                included: Optional[List[Mapping]] = None) -> str:
+    """
+    Форматирование сообщений в текст для суммаризации.
+    Объединяет сообщения из всех чатов в один текст длиной не более max_length символов
+    (без учета отметки об обрезке). Сообщения читаются за один проход, поэтому можно
+    передавать итератор; после достижения лимита оставшиеся сообщения не читаются.
     
     Args:
-        messages: Список словарей с информацией о сообщениях
+        messages: Сообщения (словари или sqlite3.Row), упорядоченные по chat_id
+        max_length: Максимальная длина текста
+        included: Список, в который добавляются сообщения, попавшие в текст
+            (и сообщения без текста, прочитанные до достижения лимита)
         
     Returns:
         Отформатированный текст для суммаризации
     """
-    if not messages:
-        return ""
+    # Формируем текст - объединяем все сообщения из всех чатов.
+    # Сообщения приходят из БД упорядоченными по chat_id, поэтому группировка
+    # по чатам выполняется за один проход. Длина считается вместе с заголовками
+    # чатов и первой строкой, поэтому текст не обрезается после форматирования
+    # и каждое сообщение из included действительно есть в тексте
+    body = io.StringIO()
+    body_length = 0
+    chats_count = 0
+    truncated = False
     
-    # Группируем сообщения по чатам для лучшей структуры
-    chats = {}
-    for msg in messages:
-        chat_id = msg['chat_id']
-        if chat_id not in chats:
-            chats[chat_id] = []
-        chats[chat_id].append(msg)
-    
-    # Формируем текст - объединяем все сообщения из всех чатов
-    text_parts = []
-    
-    # Сначала добавляем информацию о количестве чатов
-    text_parts.append(f"Сообщения из {len(chats)} чатов:\n")
-    
-    # Проходим по всем чатам и добавляем все сообщения
-    for chat_id, chat_messages in chats.items():
-        # Определяем название чата (берем наиболее часто встречающееся имя отправителя)
-        senders = [msg.get('sender', '') for msg in chat_messages if msg.get('sender')]
-        if senders:
-            # Берем первое непустое имя отправителя как название чата
-            chat_name = senders[0] if senders[0] else f"Чат {chat_id}"
-        else:
-            chat_name = f"Чат {chat_id}"
-        
-        text_parts.append(f"\n--- {chat_name} (чат ID: {chat_id}) ---")
+    def prefix(count: int) -> str:
+        # Первая строка с количеством чатов
+        return f"Сообщения из {count} чатов:\n"
+    
+    # Проходим по всем чатам и добавляем сообщения, пока они помещаются в лимит
+    for chat_id, chat_messages in groupby(messages, key=itemgetter('chat_id')):
+        # Название чата: первое непустое имя отправителя среди сообщений,
+        # прочитанных до первой строки чата (тогда же пишется заголовок)
+        chat_name = None
+        header_written = False
         
-        # Добавляем все сообщения из этого чата
         for msg in chat_messages:
-            sender = msg.get('sender', 'Неизвестный')
-            text = msg.get('text', '').strip()
+            sender = msg['sender']
+            if chat_name is None and sender:
+                chat_name = sender
+            text = (msg['text'] or '').strip()
             
-            if text:
-                # Ограничиваем длину текста для каждого сообщения
-                if len(text) > 300:
-                    text = text[:300] + "..."
-                text_parts.append(f"{sender}: {text}")
+            if not text:
+                # Сообщение без текста в саммари не попадает, но считается обработанным
+                if included is not None:
+                    included.append(msg)
+                continue
+            
+            # Ограничиваем длину текста для каждого сообщения
+            if len(text) > 300:
+                text = text[:300] + "..."
+            piece = f"\n{sender}: {text}"
+            if not header_written:
+                header = f"\n\n--- {chat_name or f'Чат {chat_id}'} (чат ID: {chat_id}) ---"
+                piece = header + piece
+            count = chats_count if header_written else chats_count + 1
+            
+            if len(prefix(count)) + body_length + len(piece) > max_length:
+                # Сообщение не помещается: оно и все следующие попадут в следующее саммари
+                truncated = True
+                break
+            
+            if not header_written:
+                header_written = True
+                chats_count += 1
+            body.write(piece)
+            body_length += len(piece)
+            if included is not None:
+                included.append(msg)
+        
+        if truncated:
+            break
+    
+    if not chats_count:
+        return ""
+    
+    # Сначала идет информация о количестве чатов
+    formatted_text = prefix(chats_count) + body.getvalue()
+    
+    if truncated:
+        logger.warning(f"Текст слишком длинный, обрезаем до {max_length} символов")
+        formatted_text += "\n\n[... текст обрезан ...]"
     
-    return "\n".join(text_parts)
+    return formatted_text
 
 
-def create_summary(messages: List[Dict]) -> Optional[str]:
+async def create_summary(messages: Iterable[Mapping],
+                         included: Optional[List[Mapping]] = None) -> Optional[str]:
     """
-    Создание саммари из списка сообщений через GigaChat.
+    Создание саммари из сообщений через GigaChat.
+    Форматирование текста и запрос к API выполняются в отдельном потоке,
+    чтобы не блокировать event loop.
     
     Args:
-        messages: Список словарей с информацией о сообщениях
+        messages: Сообщения (словари или sqlite3.Row), упорядоченные по chat_id
+        included: Список, в который добавляются сообщения, попавшие в текст саммари
         
     Returns:
         Текст саммари или None в случае ошибки
     """
-    if not messages:
-        return None
-    
     try:
         # Форматируем сообщения для суммаризации
-        formatted_text = format_messages_for_summary(messages)
+        formatted_text = await asyncio.to_thread(
+            format_messages_for_summary, messages, MAX_SUMMARY_TEXT_LENGTH, included
+        )
+    except Exception as e:
+        logger.error(f"Неожиданная ошибка при создании саммари: {e}")
+        return None
+    
+    return await create_summary_from_text(formatted_text)
+
+
+async def create_summary_from_text(formatted_text: str) -> Optional[str]:
+    """
+    Создание саммари из уже отформатированного текста сообщений через GigaChat.
+    Запрос к API выполняется в отдельном потоке, чтобы не блокировать event loop.
+    
+    Args:
+        formatted_text: Текст, подготовленный format_messages_for_summary
         
+    Returns:
+        Текст саммари или None в случае ошибки
+    """
+    try:
         if not formatted_text or not formatted_text.strip():
             logger.warning("Нет текста для суммаризации")
             return None
         
-        # Ограничиваем общий размер текста (GigaChat имеет лимиты)
-        max_length = 10000  # Примерный лимит
-        if len(formatted_text) > max_length:
-            logger.warning(f"Текст слишком длинный ({len(formatted_text)} символов), обрезаем до {max_length}")
-            formatted_text = formatted_text[:max_length] + "\n\n[... текст обрезан ...]"
-        
         # Системное сообщение для суммаризации
         system_message = """Ты – ассистент, который создает краткие и информативные выжимки (саммари) из множества сообщений из разных чатов Telegram.
 
@@ -118,8 +191,9 @@ def create_summary(messages: List[Dict]) -> Optional[str]:
 
 Сделай структурированную выжимку, выделив основные темы и важные моменты из ВСЕХ чатов. Не группируй по чатам, а объединяй информацию."""
         
-        logger.info(f"Создание саммари из {len(messages)} сообщений...")
-        summary = chat_completion(user_message, system_message)
+        logger.info(f"Создание саммари из текста длиной {len(formatted_text)} символов...")
+        # Повторный запуск по тем же сообщениям вернет сохраненное саммари без запроса к API
+        summary = await asyncio.to_thread(chat_completion, user_message, system_message, use_cache=True)
         
         logger.info("Саммари успешно создано")
         return summary
@@ -132,47 +206,59 @@ def create_summary(messages: List[Dict]) -> Optional[str]:
         return None
 
 
-def generate_summary_from_db() -> Tuple[Optional[str], int]:
+async def generate_summary_from_db() -> Tuple[Optional[str], int]:
     """
     Получение новых сообщений из БД и создание саммари.
+    Обращения к БД выполняются в отдельном потоке, чтобы не блокировать event loop.
     
     Returns:
         Кортеж (саммари, количество обработанных сообщений)
         Если новых сообщений нет, возвращает (None, 0)
     """
-    db = MessagesDB()
+    db = _get_db()
     
-    # Получаем новые сообщения
-    new_messages = db.get_new_messages()
+    # Новые сообщения читаются из БД потоком
+    rows = db.iter_new_messages()
+    first = await asyncio.to_thread(next, rows, None)
     
-    if not new_messages:
+    if first is None:
         logger.info("Нет новых сообщений для суммаризации")
         return None, 0
     
-    logger.info(f"Найдено {len(new_messages)} новых сообщений")
-    
-    # Подсчитываем количество уникальных чатов
-    unique_chats = set(msg['chat_id'] for msg in new_messages)
-    logger.info(f"Сообщения из {len(unique_chats)} чатов: {unique_chats}")
+    # Форматируем текст. Форматирование останавливается на лимите длины текста:
+    # помечаются только сообщения, попавшие в текст (included), а непрочитанные
+    # и не поместившиеся попадут в следующее саммари
+    included = []
+    try:
+        formatted_text = await asyncio.to_thread(
+            format_messages_for_summary, chain([first], rows), MAX_SUMMARY_TEXT_LENGTH, included
+        )
+    finally:
+        # Освобождаем соединение на чтение (и снимок WAL) до запроса к API,
+        # даже если выборка прочитана не до конца
+        rows.close()
     
-    # Создаем саммари
-    summary = create_summary(new_messages)
+    summary = await create_summary_from_text(formatted_text)
+    message_ids = [(msg['id'], msg['chat_id']) for msg in included]
+    count = len(message_ids)
+    logger.info(f"В саммари вошло {count} новых сообщений")
     
     if summary:
+        # Самое позднее сообщение (сообщения упорядочены по чатам, поэтому ищем явно)
+        last_message = max(included, key=itemgetter('date', 'id'))
+        
         # Помечаем все обработанные сообщения как summarised
-        message_ids = [(msg['id'], msg['chat_id']) for msg in new_messages]
-        db.mark_messages_as_summarised(message_ids)
+        await asyncio.to_thread(db.mark_messages_as_summarised, message_ids)
         
         # Также обновляем состояние для обратной совместимости
-        last_message = new_messages[-1]
-        db.update_last_processed(
+        await asyncio.to_thread(
+            db.update_last_processed,
             last_date=last_message['date'],
             last_id=last_message['id'],
             last_chat_id=last_message['chat_id']
         )
-        logger.info(f"Саммари создано, обработано {len(new_messages)} сообщений")
-        return summary, len(new_messages)
+        logger.info(f"Саммари создано, обработано {count} сообщений")
+        return summary, count
     else:
         logger.error("Не удалось создать саммари")
-        return None, len(new_messages)
-
+        return None, count
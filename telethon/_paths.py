@@ -0,0 +1,15 @@
+"""
+Пути проекта, общие для модулей и скриптов telethon/.
+Вычисляются один раз при импорте.
+"""
+
+from pathlib import Path
+
+# Корень проекта (на уровень выше от telethon/)
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Имя файла базы данных сообщений
+DB_FILENAME = 'telegram_messages.db'
+
+# Путь к базе данных сообщений по умолчанию
+DEFAULT_DB = PROJECT_ROOT / DB_FILENAME
@@ -5,36 +5,240 @@
 
 import sqlite3
 import asyncio
-import os
+import logging
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional
+from pathlib import Path
+from typing import List, Optional
+
+from _paths import DB_FILENAME, PROJECT_ROOT
+
+logger = logging.getLogger(__name__)
+
+# Имя базы данных в памяти (без файла на диске)
+MEMORY_DB = ':memory:'
+
+# Настройки соединения, применяемые один раз при его открытии
+# (для базы в памяти не применяются: WAL и mmap для нее не имеют смысла).
+# page_size действует только для нового файла БД, поэтому задается до journal_mode,
+# который первым записывает заголовок; у существующей БД размер страницы не меняется
+CONNECTION_PRAGMAS = """
+    PRAGMA page_size=8192;
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-64000;
+    PRAGMA mmap_size=268435456;
+    PRAGMA wal_autocheckpoint=1000;
+"""
+
+# Настройки соединения только для чтения: query_only запрещает запись
+# на уровне SQLite, остальные совпадают с настройками основного соединения
+READER_PRAGMAS = """
+    PRAGMA query_only=1;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-64000;
+    PRAGMA mmap_size=268435456;
+"""
+
+# Версия схемы БД (PRAGMA user_version), которую создает _migrate_schema.
+# Версии общие для всех компонентов, работающих с БД:
+# 1 - в таблице messages есть колонка is_summarised (telegram_bot/db_utils.py),
+# 2 - полная схема таблицы messages и ее индексов,
+# 3 - составные индексы (chat_id, id) и по необработанным сообщениям вместо одноколоночных,
+# 4 - таблица message_counts со счетчиками сообщений по чатам,
+# 5 - дата сообщения хранится как INTEGER (unix-время в секундах, UTC),
+# 6 - колонка text_z со сжатым текстом длинных сообщений,
+# 7 - индексы для запросов дашборда (flask/flask_db.py)
+SCHEMA_VERSION = 7
+
+# Часть схемы, не зависящая от текущей структуры таблицы messages. Выполняется
+# одним вызовом executescript после исправления структуры таблицы (_migrate_schema):
+# - даты, сохраненные текстом ISO, переводятся в unix-время (колонка TIMESTAMP
+#   имеет числовое сродство и хранит целые числа без пересоздания таблицы);
+# - составной индекс (chat_id, id) (тот же, что создает бот) заменяет прежний индекс только по chat_id;
+# - частичный индекс только по необработанным сообщениям (тот же, что создает бот)
+#   пустеет после каждой выжимки, в отличие от индекса по всей колонке is_summarised,
+#   и одним спуском по B-дереву отвечает на выборку необработанных сообщений чата по дате;
+# - счетчики сообщений по чатам поддерживаются триггерами, поэтому подсчет сообщений
+#   не требует просмотра всей таблицы. Пропущенные INSERT OR IGNORE дубликаты
+#   триггер не вызывают. Счетчики пересчитываются при каждой миграции;
+# - покрывающий индекс (type, is_summarised, chat_id): статистика дашборда
+#   считается без обращения к таблице;
+# - частичный индекс по обработанным сообщениям: последняя выжимка находится
+#   чтением крайней записи индекса, без сортировки (is_summarised в ключе,
+#   чтобы планировщик выбирал индекс и без ANALYZE)
+SCHEMA_SQL = """
+    UPDATE messages SET date = CAST(strftime('%s', date) AS INTEGER)
+    WHERE typeof(date) = 'text';
+    
+    DROP INDEX IF EXISTS idx_chat_id;
+    CREATE INDEX IF NOT EXISTS idx_messages_chat_id ON messages(chat_id, id);
+    CREATE INDEX IF NOT EXISTS idx_date ON messages(date);
+    
+    DROP INDEX IF EXISTS idx_is_summarised;
+    CREATE INDEX IF NOT EXISTS idx_messages_pending_by_chat ON messages(is_summarised, chat_id, date, id)
+    WHERE is_summarised = 0;
+    
+    CREATE TABLE IF NOT EXISTS message_counts (
+        chat_id INTEGER PRIMARY KEY,
+        n INTEGER NOT NULL
+    );
+    CREATE TRIGGER IF NOT EXISTS trg_message_counts_insert AFTER INSERT ON messages
+    BEGIN
+        INSERT INTO message_counts (chat_id, n) VALUES (NEW.chat_id, 1)
+        ON CONFLICT(chat_id) DO UPDATE SET n = n + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_message_counts_delete AFTER DELETE ON messages
+    BEGIN
+        UPDATE message_counts SET n = n - 1 WHERE chat_id = OLD.chat_id;
+    END;
+    DELETE FROM message_counts;
+    INSERT INTO message_counts (chat_id, n)
+    SELECT chat_id, COUNT(*) FROM messages GROUP BY chat_id;
+    
+    CREATE INDEX IF NOT EXISTS idx_type_summ ON messages(type, is_summarised, chat_id);
+    CREATE INDEX IF NOT EXISTS idx_summarised_date ON messages(is_summarised, date)
+    WHERE is_summarised = 1;
+"""
+
+# Запросы, выполняемые при каждом обращении к БД. Текст запросов неизменен,
+# поэтому подготовленные выражения берутся из кэша соединения (cached_statements).
+# is_summarised при вставке не указывается: новые сообщения получают DEFAULT 0,
+# а дубликаты пропускаются (OR IGNORE), не сбрасывая отметку об обработке
+SQL_INSERT = '''
+    INSERT OR IGNORE INTO messages (id, chat_id, sender, type, text, text_z, date)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+SQL_COUNT_ALL = 'SELECT COALESCE(SUM(n), 0) FROM message_counts'
+SQL_COUNT_CHAT = 'SELECT n FROM message_counts WHERE chat_id = ?'
+
+# Размер кэша подготовленных выражений соединения
+CACHED_STATEMENTS = 256
+
+# Максимальный размер пакета сообщений, записываемого одной транзакцией
+WRITE_BATCH_SIZE = 500
+# Максимальное время накопления пакета перед записью, в секундах
+WRITE_FLUSH_INTERVAL = 0.1
+# Максимальное количество сообщений, ожидающих записи; при переполнении
+# новые сообщения отбрасываются, чтобы всплеск не занимал память без ограничений
+WRITE_QUEUE_SIZE = 10_000
+
+# Текст сообщения длиннее TEXT_COMPRESS_MIN_LENGTH символов сохраняется сжатым (zlib)
+# в колонку text_z, а колонка text остается NULL. Короткие сообщения (большинство)
+# хранятся как есть: выигрыш от их сжатия не окупает распаковку при чтении
+TEXT_COMPRESS_MIN_LENGTH = 1024
+# Уровень сжатия zlib
+TEXT_COMPRESS_LEVEL = 6
+
+# Интервал между запусками PRAGMA optimize (обновление статистики планировщика), в секундах
+OPTIMIZE_INTERVAL = 15 * 60
+
+
+def _pack_row(row: tuple) -> tuple:
+    """
+    Подготовка строки сообщения к записи: длинный текст сжимается в text_z.
+    
+    Args:
+        row: Кортеж (id, chat_id, sender, type, text, date)
+        
+    Returns:
+        Кортеж (id, chat_id, sender, type, text, text_z, date) для SQL_INSERT
+    """
+    message_id, chat_id, sender, message_type, text, date = row
+    if text and len(text) >= TEXT_COMPRESS_MIN_LENGTH:
+        encoded = text.encode('utf-8')
+        compressed = zlib.compress(encoded, TEXT_COMPRESS_LEVEL)
+        # Несжимаемый текст оставляем как есть
+        if len(compressed) < len(encoded):
+            return (message_id, chat_id, sender, message_type, None, compressed, date)
+    return (message_id, chat_id, sender, message_type, text, None, date)
 
 
 class Database:
     """Класс для работы с базой данных SQLite."""
     
-    def __init__(self, db_name: str = 'telegram_messages.db'):
+    def __init__(self, db_name: str = DB_FILENAME):
         """
         Инициализация подключения к базе данных.
         
         Args:
             db_name: Имя файла базы данных
         """
-        # Определяем путь к корню проекта (на уровень выше от telethon/)
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.dirname(current_dir)  # Поднимаемся на уровень выше
-        self.db_name = os.path.join(project_root, db_name)
+        if db_name == MEMORY_DB:
+            self.db_name = db_name
+        else:
+            # Файл базы данных лежит в корне проекта
+            self.db_name = str(PROJECT_ROOT / db_name)
+        # Одно соединение на весь срок жизни объекта; блокировка сериализует
+        # обращения к нему из потока БД и из потока, создавшего объект
+        self._connection = sqlite3.connect(self.db_name, check_same_thread=False, isolation_level=None,
+                                           cached_statements=CACHED_STATEMENTS)
+        self._apply_pragmas(self._connection)
+        self._lock = threading.Lock()
+        # Все операции с БД выполняются в одном выделенном потоке,
+        # а не в потоках общего executor event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite-db')
+        # Очередь сообщений на запись и фоновая задача, записывающая их пакетами
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        # Фоновая задача, периодически обновляющая статистику планировщика
+        self._optimizer_task: Optional[asyncio.Task] = None
         self._init_db()
+        # Отдельное соединение только для чтения: в режиме WAL подсчеты читают
+        # последний зафиксированный снимок и не ждут записи пакетов сообщений.
+        # База в памяти доступна только своему соединению, поэтому для нее
+        # чтение идет через основное соединение
+        if self.db_name == MEMORY_DB:
+            self._reader = self._connection
+            self._read_lock = self._lock
+        else:
+            self._reader = sqlite3.connect(f"{Path(self.db_name).as_uri()}?mode=ro", uri=True,
+                                           check_same_thread=False, isolation_level=None,
+                                           cached_statements=CACHED_STATEMENTS)
+            self._reader.executescript(READER_PRAGMAS)
+            self._read_lock = threading.Lock()
     
     def _init_db(self):
         """Создание таблицы messages, если она не существует."""
-        import logging
-        logger = logging.getLogger(__name__)
         logger.info(f"Инициализация базы данных: {self.db_name}")
         
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+        with self._lock:
+            cursor = self._connection.cursor()
+            try:
+                # Миграция выполняется, только если схема старее текущей версии
+                cursor.execute('PRAGMA user_version')
+                if cursor.fetchone()[0] < SCHEMA_VERSION:
+                    # Структура таблицы исправляется отдельной транзакцией: executescript
+                    # фиксирует открытую транзакцию перед выполнением скрипта.
+                    # Оба шага идемпотентны, а версия схемы записывается только
+                    # вместе с SCHEMA_SQL, поэтому прерванная миграция повторится целиком
+                    cursor.execute('BEGIN IMMEDIATE')
+                    try:
+                        self._migrate_schema(cursor)
+                        cursor.execute('COMMIT')
+                        cursor.executescript(
+                            f'BEGIN IMMEDIATE; {SCHEMA_SQL} PRAGMA user_version = {SCHEMA_VERSION}; COMMIT;'
+                        )
+                    except Exception:
+                        if self._connection.in_transaction:
+                            cursor.execute('ROLLBACK')
+                        raise
+            finally:
+                cursor.close()
         
+        logger.info(f"База данных инициализирована: {self.db_name}")
+    
+    def _migrate_schema(self, cursor: sqlite3.Cursor):
+        """
+        Создание таблицы messages и исправление ее структуры
+        (недостающие колонки, составной PRIMARY KEY).
+        
+        Args:
+            cursor: Курсор соединения с открытой транзакцией
+        """
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS messages (
                 id INTEGER NOT NULL,
@@ -42,34 +246,32 @@ class Database:
                 sender TEXT,
                 type TEXT,
                 text TEXT,
-                date TIMESTAMP,
+                date INTEGER,
                 is_summarised INTEGER DEFAULT 0,
+                text_z BLOB,
                 PRIMARY KEY (id, chat_id)
             )
         ''')
         
-        # Добавляем колонку type, если она не существует (миграция для существующих БД)
-        try:
+        # Добавляем недостающие колонки type, is_summarised и text_z (миграция для существующих БД)
+        cursor.execute('PRAGMA table_info(messages)')
+        columns = cursor.fetchall()
+        existing_columns = {col[1] for col in columns}
+        if 'type' not in existing_columns:
             cursor.execute('ALTER TABLE messages ADD COLUMN type TEXT')
-        except sqlite3.OperationalError:
-            # Колонка уже существует, игнорируем ошибку
-            pass
-        
-        # Добавляем колонку is_summarised, если она не существует (миграция для существующих БД)
-        try:
+        if 'is_summarised' not in existing_columns:
+            # DEFAULT 0 сразу помечает существующие записи как необработанные
             cursor.execute('ALTER TABLE messages ADD COLUMN is_summarised INTEGER DEFAULT 0')
-            # Обновляем существующие записи - помечаем как необработанные
-            cursor.execute('UPDATE messages SET is_summarised = 0 WHERE is_summarised IS NULL')
             logger.info("Добавлена колонка is_summarised в таблицу messages")
-        except sqlite3.OperationalError:
-            # Колонка уже существует, игнорируем ошибку
-            pass
+        if 'text_z' not in existing_columns:
+            cursor.execute('ALTER TABLE messages ADD COLUMN text_z BLOB')
         
         # Проверяем структуру таблицы и исправляем PRIMARY KEY, если нужно
-        cursor.execute('PRAGMA table_info(messages)')
-        columns = cursor.fetchall()
-        # Ищем, есть ли PRIMARY KEY только на id
-        has_single_pk = any(col[5] == 1 and col[1] == 'id' for col in columns)
+        # (добавление колонок выше PRIMARY KEY не меняет, поэтому columns актуален).
+        # Старая структура - PRIMARY KEY только на id. Проверяются все колонки ключа:
+        # в составном ключе (id, chat_id) у id тоже col[5] = 1, и проверка одной
+        # колонки id пересоздавала бы таблицу при каждой миграции
+        has_single_pk = [col[1] for col in columns if col[5]] == ['id']
         
         if has_single_pk:
             logger.info("Обнаружена старая структура таблицы. Выполняется миграция...")
@@ -84,43 +286,77 @@ class Database:
                     sender TEXT,
                     type TEXT,
                     text TEXT,
-                    date TIMESTAMP,
+                    date INTEGER,
                     is_summarised INTEGER DEFAULT 0,
+                    text_z BLOB,
                     PRIMARY KEY (id, chat_id)
                 )
             ''')
-            # Копируем данные с установкой is_summarised = 0 для всех существующих записей
+            # Копируем данные вместе с отметками об обработке. Колонки is_summarised
+            # и text_z к этому моменту гарантированно есть (добавлены выше; у добавленной
+            # is_summarised все записи получили DEFAULT 0)
             cursor.execute('''
-                INSERT OR IGNORE INTO messages_new (id, chat_id, sender, type, text, date, is_summarised)
-                SELECT id, chat_id, sender, type, text, date, 0 FROM messages
+                INSERT OR IGNORE INTO messages_new (id, chat_id, sender, type, text, date, is_summarised, text_z)
+                SELECT id, chat_id, sender, type, text, date, is_summarised, text_z FROM messages
             ''')
             # Удаляем старую таблицу
             cursor.execute('DROP TABLE messages')
             # Переименовываем новую таблицу
             cursor.execute('ALTER TABLE messages_new RENAME TO messages')
             logger.info("Миграция завершена. Теперь используется составной PRIMARY KEY (id, chat_id)")
+    
+    def _apply_pragmas(self, conn: sqlite3.Connection):
+        """
+        Применение настроек соединения (кроме базы в памяти).
         
-        # Создаем индексы для быстрого поиска
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_chat_id ON messages(chat_id)
-        ''')
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_date ON messages(date)
-        ''')
+        Args:
+            conn: Соединение с базой данных
+        """
+        if self.db_name != MEMORY_DB:
+            conn.executescript(CONNECTION_PRAGMAS)
+    
+    async def save_messages(self, rows: List[tuple]) -> int:
+        """
+        Сохранение пакета сообщений в базу данных одной транзакцией.
+        Сообщения, которые уже есть в базе, пропускаются.
         
-        # Проверяем наличие колонки is_summarised перед созданием индекса
-        cursor.execute('PRAGMA table_info(messages)')
-        columns = cursor.fetchall()
-        has_is_summarised = any(col[1] == 'is_summarised' for col in columns)
+        Args:
+            rows: Список кортежей (id, chat_id, sender, type, text, date), date - unix-время в секундах
+            
+        Returns:
+            Количество добавленных сообщений
+        """
+        if not rows:
+            return 0
         
-        if has_is_summarised:
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_is_summarised ON messages(is_summarised)
-            ''')
+        self._ensure_optimizer()
         
-        conn.commit()
-        conn.close()
-        logger.info(f"База данных инициализирована: {self.db_name}")
+        def _save_bulk():
+            with self._lock:
+                cursor = self._connection.cursor()
+                
+                try:
+                    cursor.execute('BEGIN IMMEDIATE')
+                    # Сжатие текста выполняется здесь же, в потоке БД, а не в event loop
+                    cursor.executemany(SQL_INSERT, map(_pack_row, rows))
+                    inserted = cursor.rowcount
+                    cursor.execute('COMMIT')
+                except sqlite3.Error as e:
+                    if self._connection.in_transaction:
+                        self._connection.execute('ROLLBACK')
+                    logger.error(f"Ошибка при сохранении {len(rows)} сообщений в БД {self.db_name}: {e}")
+                    return 0
+                finally:
+                    cursor.close()
+            
+            # Ленивое форматирование: строка собирается, только если сообщение будет выведено
+            logger.info("✓ Сохранено %d из %d сообщений в БД: %s", inserted, len(rows), self.db_name)
+            return inserted
+        
+        # Выполняем в потоке БД, чтобы не блокировать event loop
+        # (asyncio.to_thread не подходит: он использует общий executor)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, _save_bulk)
     
     async def save_message(
         self,
@@ -132,7 +368,11 @@ class Database:
         date: datetime
     ) -> bool:
         """
-        Сохранение сообщения в базу данных с проверкой на дубликаты.
+        Постановка сообщения в очередь на сохранение в базу данных без ожидания.
+        Фоновая задача записывает накопленные сообщения пакетами
+        (каждые WRITE_FLUSH_INTERVAL секунд или по WRITE_BATCH_SIZE сообщений),
+        дубликаты при записи пропускаются. Если в очереди уже WRITE_QUEUE_SIZE
+        сообщений, новое сообщение отбрасывается.
         
         Args:
             message_id: ID сообщения в Telegram
@@ -143,39 +383,110 @@ class Database:
             date: Дата и время сообщения
             
         Returns:
-            True если сообщение сохранено, False если уже существует
+            True если сообщение поставлено в очередь на запись, False если очередь переполнена
         """
-        def _save():
-            import logging
-            logger = logging.getLogger(__name__)
+        self._ensure_writer()
+        try:
+            self._write_queue.put_nowait((message_id, chat_id, sender, message_type, text, int(date.timestamp())))
+        except asyncio.QueueFull:
+            logger.warning("Очередь записи переполнена, сообщение %d из чата %d отброшено", message_id, chat_id)
+            return False
+        return True
+    
+    def _ensure_writer(self):
+        """Запуск фоновой задачи записи, если она еще не запущена."""
+        if self._write_queue is None:
+            self._write_queue = asyncio.Queue(maxsize=WRITE_QUEUE_SIZE)
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._drain_writes())
+    
+    async def _drain_writes(self):
+        """Фоновая задача: забирает сообщения из очереди и записывает их пакетами."""
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            batch = [await self._write_queue.get()]
+            deadline = loop.time() + WRITE_FLUSH_INTERVAL
             
-            conn = sqlite3.connect(self.db_name)
-            cursor = conn.cursor()
+            # Копим пакет, пока он не заполнится или не истечет интервал
+            while len(batch) < WRITE_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._write_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
             
+            # Ошибки, не связанные с SQLite (save_messages обрабатывает только их),
+            # не должны останавливать задачу: иначе очередь перестанет разбираться
             try:
-                cursor.execute('''
-                    INSERT OR IGNORE INTO messages (id, chat_id, sender, type, text, date, is_summarised)
-                    VALUES (?, ?, ?, ?, ?, ?, 0)
-                ''', (message_id, chat_id, sender, message_type, text, date))
-                
-                conn.commit()
-                inserted = cursor.rowcount > 0
-                
-                if inserted:
-                    logger.info(f"✓ Сообщение {message_id} из чата {chat_id} сохранено в БД: {self.db_name}")
-                else:
-                    logger.debug(f"⊘ Сообщение {message_id} из чата {chat_id} уже существует в БД (пропущено)")
-                
-                conn.close()
-                return inserted
+                await self.save_messages(batch)
+            except Exception as e:
+                logger.error("Ошибка при записи пакета из %d сообщений в БД %s: %s", len(batch), self.db_name, e)
+            finally:
+                for _ in batch:
+                    self._write_queue.task_done()
+    
+    def _ensure_optimizer(self):
+        """Запуск фоновой задачи PRAGMA optimize, если она еще не запущена."""
+        if self._optimizer_task is None or self._optimizer_task.done():
+            self._optimizer_task = asyncio.create_task(self._optimize_periodically())
+    
+    def _optimize(self):
+        """
+        Обновление статистики планировщика запросов (PRAGMA optimize).
+        SQLite пересчитывает статистику только для индексов, где она устарела.
+        """
+        with self._lock:
+            try:
+                self._connection.execute('PRAGMA optimize')
             except sqlite3.Error as e:
-                conn.close()
-                logger.error(f"Ошибка при сохранении сообщения {message_id} в БД {self.db_name}: {e}")
-                return False
+                logger.warning("Не удалось выполнить PRAGMA optimize для БД %s: %s", self.db_name, e)
+    
+    async def _optimize_periodically(self):
+        """Фоновая задача: каждые OPTIMIZE_INTERVAL секунд выполняет PRAGMA optimize."""
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            await asyncio.sleep(OPTIMIZE_INTERVAL)
+            await loop.run_in_executor(self._executor, self._optimize)
+    
+    async def flush(self):
+        """Ожидание записи всех сообщений, поставленных в очередь."""
+        if self._write_queue is not None:
+            await self._write_queue.join()
+    
+    async def close(self):
+        """
+        Запись оставшихся сообщений, остановка фоновых задач,
+        обновление статистики планировщика и закрытие соединений с базой данных.
+        """
+        if self._writer_task is not None and not self._writer_task.done():
+            await self.flush()
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+        self._writer_task = None
         
-        # Выполняем в executor, чтобы не блокировать event loop
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, _save)
+        if self._optimizer_task is not None:
+            self._optimizer_task.cancel()
+            try:
+                await self._optimizer_task
+            except asyncio.CancelledError:
+                pass
+            self._optimizer_task = None
+        
+        self._executor.shutdown(wait=True)
+        # Статистика, накопленная за время работы, сохраняется перед закрытием
+        self._optimize()
+        with self._read_lock:
+            if self._reader is not self._connection:
+                self._reader.close()
+        with self._lock:
+            self._connection.close()
     
     async def get_message_count(self, chat_id: Optional[int] = None) -> int:
         """
@@ -188,18 +499,22 @@ class Database:
             Количество сообщений
         """
         def _count():
-            conn = sqlite3.connect(self.db_name)
-            cursor = conn.cursor()
-            
-            if chat_id:
-                cursor.execute('SELECT COUNT(*) FROM messages WHERE chat_id = ?', (chat_id,))
-            else:
-                cursor.execute('SELECT COUNT(*) FROM messages')
-            
-            count = cursor.fetchone()[0]
-            conn.close()
-            return count
+            with self._read_lock:
+                cursor = self._reader.cursor()
+                
+                try:
+                    # Количество берется из счетчиков message_counts, а не через COUNT(*)
+                    if chat_id:
+                        cursor.execute(SQL_COUNT_CHAT, (chat_id,))
+                    else:
+                        cursor.execute(SQL_COUNT_ALL)
+                    
+                    row = cursor.fetchone()
+                    return row[0] if row else 0
+                finally:
+                    cursor.close()
         
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, _count)
+        # Чтение выполняется в общем executor event loop, а не в потоке БД,
+        # чтобы подсчет не стоял в очереди за записью пакетов
+        return await asyncio.to_thread(_count)
 
@@ -3,76 +3,94 @@
 Исправляет PRIMARY KEY с (id) на (id, chat_id)
 """
 import sqlite3
-import os
 
-# Определяем путь к базе данных
-current_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.dirname(current_dir)
-db_path = os.path.join(project_root, 'telegram_messages.db')
+from _paths import DEFAULT_DB
 
-print(f"Исправление структуры базы данных: {db_path}")
+# Версия схемы (PRAGMA user_version), начиная с которой таблица messages
+# уже имеет составной PRIMARY KEY (id, chat_id)
+COMPOSITE_PK_SCHEMA_VERSION = 2
 
-conn = sqlite3.connect(db_path)
-cursor = conn.cursor()
 
-# Проверяем текущую структуру
-cursor.execute('PRAGMA table_info(messages)')
-columns = cursor.fetchall()
-has_single_pk = any(col[5] == 1 and col[1] == 'id' for col in columns)
-
-if has_single_pk:
-    print("Обнаружена старая структура таблицы. Выполняется миграция...")
+def main():
+    db_path = DEFAULT_DB
     
-    # Создаем временную таблицу с правильной структурой
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS messages_new (
-            id INTEGER NOT NULL,
-            chat_id INTEGER NOT NULL,
-            sender TEXT,
-            type TEXT,
-            text TEXT,
-            date TIMESTAMP,
-            PRIMARY KEY (id, chat_id)
-        )
-    ''')
+    print(f"Исправление структуры базы данных: {db_path}")
     
-    # Копируем данные
-    print("Копирование данных...")
-    cursor.execute('''
-        INSERT OR IGNORE INTO messages_new (id, chat_id, sender, type, text, date)
-        SELECT id, chat_id, sender, type, text, date FROM messages
-    ''')
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
     
-    # Проверяем количество скопированных записей
-    cursor.execute('SELECT COUNT(*) FROM messages_new')
-    new_count = cursor.fetchone()[0]
-    cursor.execute('SELECT COUNT(*) FROM messages')
-    old_count = cursor.fetchone()[0]
-    print(f"Скопировано {new_count} из {old_count} сообщений")
+    # Схема версии 2 и выше уже создана с составным PRIMARY KEY (см. SCHEMA_VERSION в db.py)
+    cursor.execute('PRAGMA user_version')
+    if cursor.fetchone()[0] >= COMPOSITE_PK_SCHEMA_VERSION:
+        print("Схема базы данных актуальна. Исправление не требуется.")
+        conn.close()
+        return
     
-    # Удаляем старую таблицу
-    cursor.execute('DROP TABLE messages')
+    # Проверяем текущую структуру
+    cursor.execute('PRAGMA table_info(messages)')
+    columns = cursor.fetchall()
+    # PRIMARY KEY только на id (в составном ключе у chat_id col[5] = 2)
+    has_single_pk = [col[1] for col in columns if col[5]] == ['id']
+    # Отметки об обработке переносятся, если колонка is_summarised уже есть
+    is_summarised = 'is_summarised' if any(col[1] == 'is_summarised' for col in columns) else '0'
     
-    # Переименовываем новую таблицу
-    cursor.execute('ALTER TABLE messages_new RENAME TO messages')
+    if has_single_pk:
+        print("Обнаружена старая структура таблицы. Выполняется миграция...")
+        
+        # Создаем временную таблицу с правильной структурой
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS messages_new (
+                id INTEGER NOT NULL,
+                chat_id INTEGER NOT NULL,
+                sender TEXT,
+                type TEXT,
+                text TEXT,
+                date INTEGER,
+                is_summarised INTEGER DEFAULT 0,
+                PRIMARY KEY (id, chat_id)
+            )
+        ''')
+        
+        # Копируем данные
+        print("Копирование данных...")
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO messages_new (id, chat_id, sender, type, text, date, is_summarised)
+            SELECT id, chat_id, sender, type, text, date, {is_summarised} FROM messages
+        ''')
+        
+        # Проверяем количество скопированных записей
+        cursor.execute('SELECT COUNT(*) FROM messages_new')
+        new_count = cursor.fetchone()[0]
+        cursor.execute('SELECT COUNT(*) FROM messages')
+        old_count = cursor.fetchone()[0]
+        print(f"Скопировано {new_count} из {old_count} сообщений")
+        
+        # Удаляем старую таблицу
+        cursor.execute('DROP TABLE messages')
+        
+        # Переименовываем новую таблицу
+        cursor.execute('ALTER TABLE messages_new RENAME TO messages')
+        
+        # Восстанавливаем индексы
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_id ON messages(chat_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_date ON messages(date)')
+        
+        conn.commit()
+        print("✓ Миграция завершена успешно!")
+        print("Теперь используется составной PRIMARY KEY (id, chat_id)")
+    else:
+        print("Структура таблицы уже правильная. Миграция не требуется.")
     
-    # Восстанавливаем индексы
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_id ON messages(chat_id)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_date ON messages(date)')
+    # Проверяем новую структуру
+    cursor.execute('PRAGMA table_info(messages)')
+    columns = cursor.fetchall()
+    print("\nНовая структура таблицы:")
+    for col in columns:
+        pk_info = "PRIMARY KEY" if col[5] == 1 else ""
+        print(f"  {col[1]} ({col[2]}) {pk_info}")
+    
+    conn.close()
     
-    conn.commit()
-    print("✓ Миграция завершена успешно!")
-    print("Теперь используется составной PRIMARY KEY (id, chat_id)")
-else:
-    print("Структура таблицы уже правильная. Миграция не требуется.")
-
-# Проверяем новую структуру
-cursor.execute('PRAGMA table_info(messages)')
-columns = cursor.fetchall()
-print("\nНовая структура таблицы:")
-for col in columns:
-    pk_info = "PRIMARY KEY" if col[5] == 1 else ""
-    print(f"  {col[1]} ({col[2]}) {pk_info}")
-
-conn.close()
 
+if __name__ == '__main__':
+    main()
@@ -5,9 +5,10 @@
 
 import asyncio
 import logging
-import os
+import time
 from datetime import datetime
-from typing import List, Optional
+from operator import attrgetter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from telethon import TelegramClient, events
 from telethon.errors import SessionPasswordNeededError, FloodWaitError
@@ -15,11 +16,10 @@ from telethon.tl.types import User, Channel, Chat, PeerChannel, PeerChat, PeerUs
 
 from config import API_ID, API_HASH, SESSION_NAME
 from db import Database
+from _paths import PROJECT_ROOT
 
-# Определяем путь к корню проекта для логов
-current_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.dirname(current_dir)
-log_file = os.path.join(project_root, 'telegram_bot.log')
+# Логи пишутся в корень проекта
+log_file = PROJECT_ROOT / 'telegram_bot.log'
 
 # Настройка логирования
 logging.basicConfig(
@@ -32,6 +32,26 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Извлечение ID чата в зависимости от типа peer_id
+_PEER_EXTRACT = {
+    PeerChannel: attrgetter('channel_id'),
+    PeerChat: attrgetter('chat_id'),
+    PeerUser: attrgetter('user_id'),
+}
+# Тип чата ("Channel" или "Chat") в зависимости от типа peer_id и объекта чата
+_PEER_TYPE = {PeerChannel: "Channel", PeerChat: "Chat", PeerUser: "Chat"}
+_CHAT_TYPE = {Channel: "Channel", Chat: "Chat", User: "Chat"}
+
+# Кэш объектов чатов: время жизни записи (в секундах) и максимальное количество записей
+ENTITY_CACHE_TTL = 600
+ENTITY_CACHE_SIZE = 1024
+
+# Максимальное количество записей в кэше имен отправителей (при превышении кэш очищается)
+SENDER_CACHE_SIZE = 10_000
+
+# Количество сообщений, загружаемых из истории чата одним запросом
+FETCH_PAGE_SIZE = 100
+
 # Инициализация базы данных
 db = Database()
 logger.info(f"База данных инициализирована: {db.db_name}")
@@ -44,8 +64,36 @@ class TelegramBot:
         """Инициализация клиента Telethon."""
         self.client = TelegramClient(SESSION_NAME, API_ID, API_HASH)
         self.db = db
+        # Кэш объектов чатов: chat_id -> (объект чата, время истечения)
+        self._entity_cache: Dict[int, Tuple[Any, float]] = {}
+        # Кэш имен отправителей: (тип, id) -> имя
+        self._sender_cache: Dict[Tuple[type, int], Optional[str]] = {}
         logger.info("TelegramBot инициализирован")
     
+    async def _get_chat_cached(self, chat_id: int, fetch: Callable[[], Awaitable[Any]]):
+        """
+        Получение объекта чата с кэшированием на ENTITY_CACHE_TTL секунд,
+        чтобы не запрашивать один и тот же чат у Telegram на каждое сообщение.
+        
+        Args:
+            chat_id: ID чата (ключ кэша)
+            fetch: Функция без аргументов, запрашивающая объект чата
+            
+        Returns:
+            Объект чата
+        """
+        now = time.monotonic()
+        cached = self._entity_cache.get(chat_id)
+        if cached and cached[1] > now:
+            return cached[0]
+        
+        chat = await fetch()
+        if chat_id not in self._entity_cache and len(self._entity_cache) >= ENTITY_CACHE_SIZE:
+            # Вытесняем самую старую запись
+            del self._entity_cache[next(iter(self._entity_cache))]
+        self._entity_cache[chat_id] = (chat, now + ENTITY_CACHE_TTL)
+        return chat
+    
     @staticmethod
     def _extract_chat_id(peer_id) -> Optional[int]:
         """
@@ -57,19 +105,8 @@ class TelegramBot:
         Returns:
             ID чата или None
         """
-        if hasattr(peer_id, 'channel_id'):
-            return peer_id.channel_id
-        elif hasattr(peer_id, 'chat_id'):
-            return peer_id.chat_id
-        elif hasattr(peer_id, 'user_id'):
-            return peer_id.user_id
-        elif isinstance(peer_id, PeerChannel):
-            return peer_id.channel_id
-        elif isinstance(peer_id, PeerChat):
-            return peer_id.chat_id
-        elif isinstance(peer_id, PeerUser):
-            return peer_id.user_id
-        return None
+        extract = _PEER_EXTRACT.get(type(peer_id))
+        return extract(peer_id) if extract else None
     
     @staticmethod
     def _get_chat_type(chat, peer_id=None) -> str:
@@ -83,24 +120,9 @@ class TelegramBot:
         Returns:
             "Channel" если это канал, "Chat" если это чат
         """
-        # Проверяем через peer_id (если передан)
-        if peer_id:
-            if isinstance(peer_id, PeerChannel) or hasattr(peer_id, 'channel_id'):
-                return "Channel"
-            elif isinstance(peer_id, PeerChat) or hasattr(peer_id, 'chat_id'):
-                return "Chat"
-            elif isinstance(peer_id, PeerUser) or hasattr(peer_id, 'user_id'):
-                return "Chat"
-        
-        # Проверяем через объект чата
-        if chat:
-            if isinstance(chat, Channel):
-                return "Channel"
-            elif isinstance(chat, Chat) or isinstance(chat, User):
-                return "Chat"
-        
-        # По умолчанию считаем чатом
-        return "Chat"
+        # Проверяем через peer_id (если передан), затем через объект чата,
+        # по умолчанию считаем чатом
+        return _PEER_TYPE.get(type(peer_id)) or _CHAT_TYPE.get(type(chat), "Chat")
     
     async def connect(self):
         """
@@ -141,6 +163,59 @@ class TelegramBot:
             logger.error(f"Ошибка при получении диалогов: {e}")
             return []
     
+    def _format_sender(self, sender) -> Optional[str]:
+        """
+        Получение имени отправителя с кэшированием: одни и те же отправители
+        встречаются в чате многократно.
+        
+        Args:
+            sender: Отправитель сообщения (User, Channel, Chat или None)
+            
+        Returns:
+            Имя отправителя или None, если его не удалось определить
+        """
+        if not sender:
+            return None
+        
+        key = (type(sender), sender.id)
+        if key in self._sender_cache:
+            return self._sender_cache[key]
+        
+        sender_name = None
+        if isinstance(sender, User):
+            sender_name = f"{sender.first_name or ''} {sender.last_name or ''}".strip()
+            if not sender_name:
+                sender_name = sender.username or f"User{sender.id}"
+        elif hasattr(sender, 'title'):
+            sender_name = sender.title
+        
+        if len(self._sender_cache) >= SENDER_CACHE_SIZE:
+            self._sender_cache.clear()
+        self._sender_cache[key] = sender_name
+        return sender_name
+    
+    def _message_row(self, message, chat) -> tuple:
+        """
+        Подготовка строки для сохранения сообщения в базу данных.
+        
+        Args:
+            message: Сообщение из Telegram
+            chat: Объект чата (или None, тогда тип определяется по peer_id)
+            
+        Returns:
+            Кортеж (id, chat_id, sender, type, text, date), date - unix-время в секундах
+        """
+        sender_name = self._format_sender(message.sender)
+        text = message.text or message.raw_text or ""
+        
+        # Извлечение ID чата
+        chat_id = self._extract_chat_id(message.peer_id) or message.chat_id
+        
+        # Определение типа чата
+        message_type = self._get_chat_type(chat, message.peer_id)
+        
+        return (message.id, chat_id, sender_name, message_type, text, int(message.date.timestamp()))
+    
     async def get_chat_messages(self, chat_id: int, limit: int = 100) -> List:
         """
         Сбор последних N сообщений из выбранного чата.
@@ -154,50 +229,48 @@ class TelegramBot:
         """
         try:
             messages = []
-            async for message in self.client.iter_messages(chat_id, limit=limit):
-                messages.append(message)
-                
-                # Сохранение в базу данных
-                sender_name = None
-                if message.sender:
-                    if isinstance(message.sender, User):
-                        sender_name = f"{message.sender.first_name or ''} {message.sender.last_name or ''}".strip()
-                        if not sender_name:
-                            sender_name = message.sender.username or f"User{message.sender.id}"
-                    elif hasattr(message.sender, 'title'):
-                        sender_name = message.sender.title
-                
-                text = message.text or message.raw_text or ""
-                
-                # Извлечение ID чата
-                chat_id = self._extract_chat_id(message.peer_id) or message.chat_id
-                
-                # Получение объекта чата для определения типа
-                try:
-                    chat = await self.client.get_entity(chat_id)
-                    message_type = self._get_chat_type(chat, message.peer_id)
-                except Exception:
-                    # Если не удалось получить чат, определяем по peer_id
-                    message_type = self._get_chat_type(None, message.peer_id)
-                
-                saved = await self.db.save_message(
-                    message_id=message.id,
-                    chat_id=chat_id,
-                    sender=sender_name,
-                    message_type=message_type,
-                    text=text,
-                    date=message.date
-                )
-                if not saved:
-                    logger.debug(f"Сообщение {message.id} из чата {chat_id} не было сохранено (возможно, уже существует)")
+            # Задачи записи страниц в БД: запись страницы идет параллельно с загрузкой следующей
+            writes = []
+            
+            # Объект чата одинаков для всех сообщений: запрашиваем его один раз до цикла
+            try:
+                chat = await self._get_chat_cached(chat_id, lambda: self.client.get_entity(chat_id))
+            except Exception:
+                # Если не удалось получить чат, тип определяется по peer_id
+                chat = None
+            
+            try:
+                # Сообщения загружаются страницами по FETCH_PAGE_SIZE, от новых к старым
+                offset_id = 0
+                while len(messages) < limit:
+                    page_size = min(FETCH_PAGE_SIZE, limit - len(messages))
+                    try:
+                        page = await self.client.get_messages(chat_id, limit=page_size, offset_id=offset_id)
+                    except FloodWaitError as e:
+                        # После ожидания продолжаем с той же страницы: уже загруженные
+                        # и сохраненные сообщения повторно не запрашиваются
+                        logger.warning(f"Превышен лимит запросов. Ожидание {e.seconds} секунд...")
+                        await asyncio.sleep(e.seconds)
+                        continue
+                    if not page:
+                        break
+                    
+                    messages.extend(page)
+                    writes.append(asyncio.create_task(
+                        self.db.save_messages([self._message_row(message, chat) for message in page])
+                    ))
+                    
+                    if len(page) < page_size:
+                        # История чата закончилась
+                        break
+                    offset_id = page[-1].id
+            finally:
+                # Дожидаемся записи всех загруженных страниц
+                await asyncio.gather(*writes)
             
             logger.info(f"Получено и сохранено {len(messages)} сообщений из чата {chat_id}")
             return messages
             
-        except FloodWaitError as e:
-            logger.warning(f"Превышен лимит запросов. Ожидание {e.seconds} секунд...")
-            await asyncio.sleep(e.seconds)
-            return await self.get_chat_messages(chat_id, limit)
         except Exception as e:
             logger.error(f"Ошибка при получении сообщений из чата {chat_id}: {e}")
             return []
@@ -213,33 +286,30 @@ class TelegramBot:
             Сохраняет сообщения в базу и выводит в консоль.
             """
             try:
-                # Получение информации о чате
-                chat = await event.get_chat()
+                # Получение ID чата
+                chat_id = self._extract_chat_id(event.message.peer_id)
+                
+                # Получение информации о чате (из кэша, если чат уже встречался)
+                if chat_id:
+                    chat = await self._get_chat_cached(chat_id, event.get_chat)
+                else:
+                    chat = await event.get_chat()
                 chat_title = getattr(chat, 'title', None) or getattr(chat, 'first_name', 'Unknown')
                 
                 # Получение информации об отправителе
                 sender = await event.get_sender()
-                sender_name = "Unknown"
-                if sender:
-                    if isinstance(sender, User):
-                        sender_name = f"{sender.first_name or ''} {sender.last_name or ''}".strip()
-                        if not sender_name:
-                            sender_name = sender.username or f"User{sender.id}"
-                    elif hasattr(sender, 'title'):
-                        sender_name = sender.title
+                sender_name = self._format_sender(sender) or "Unknown"
                 
                 # Получение текста сообщения
                 text = event.message.text or event.message.raw_text or "[медиа/файл]"
                 
-                # Получение ID чата
-                chat_id = self._extract_chat_id(event.message.peer_id)
-                
                 # Определение типа чата
                 message_type = self._get_chat_type(chat, event.message.peer_id)
                 
                 # Сохранение в базу данных
+                # (без ожидания: при переполнении очереди записи сообщение отбрасывается)
                 if chat_id:
-                    saved = await self.db.save_message(
+                    queued = await self.db.save_message(
                         message_id=event.message.id,
                         chat_id=chat_id,
                         sender=sender_name,
@@ -247,14 +317,14 @@ class TelegramBot:
                         text=text,
                         date=event.message.date
                     )
-                    if saved:
-                        logger.info(f"Новое сообщение {event.message.id} из чата {chat_id} сохранено в БД")
-                    else:
-                        logger.debug(f"Сообщение {event.message.id} из чата {chat_id} уже существует в БД")
+                    # Подробности по каждому сообщению - на уровне DEBUG, с ленивым форматированием
+                    if queued:
+                        logger.debug("Новое сообщение %d из чата %d поставлено в очередь на запись в БД",
+                                     event.message.id, chat_id)
                 
                 # Вывод в консоль в формате [CHAT TITLE] sender: text
                 print(f"[{chat_title}] {sender_name}: {text}")
-                logger.info(f"Новое сообщение из [{chat_title}] от {sender_name}")
+                logger.info("Новое сообщение из [%s] от %s", chat_title, sender_name)
                 
             except Exception as e:
                 logger.error(f"Ошибка при обработке нового сообщения: {e}")
@@ -307,7 +377,8 @@ async def main():
             messages = await bot.get_chat_messages(chat_id, limit=100)
             print(f"Собрано {len(messages)} сообщений")
             
-            # Показываем статистику базы данных
+            # Показываем статистику базы данных (после записи всех сообщений из очереди)
+            await db.flush()
             total_messages = await db.get_message_count()
             print(f"Всего сообщений в базе данных: {total_messages}")
         
@@ -325,6 +396,8 @@ async def main():
     except Exception as e:
         logger.error(f"Критическая ошибка: {e}")
     finally:
+        # Записываем сообщения, оставшиеся в очереди
+        await db.close()
         await bot.client.disconnect()
         logger.info("Отключение от Telegram")
 
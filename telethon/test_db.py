@@ -2,39 +2,57 @@
 Тестовый скрипт для проверки работы базы данных
 """
 import sqlite3
-import os
 
-# Определяем путь к базе данных
-current_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.dirname(current_dir)
-db_path = os.path.join(project_root, 'telegram_messages.db')
+from _paths import DEFAULT_DB
 
-print(f"Путь к базе данных: {db_path}")
-print(f"База данных существует: {os.path.exists(db_path)}")
+# Версия схемы (PRAGMA user_version), начиная с которой есть таблица message_counts
+# (версия 4 - см. SCHEMA_VERSION в db.py)
+MESSAGE_COUNTS_SCHEMA_VERSION = 4
 
-if os.path.exists(db_path):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+
+def main():
+    db_path = DEFAULT_DB
     
-    # Проверяем структуру таблицы
-    cursor.execute('PRAGMA table_info(messages)')
-    columns = cursor.fetchall()
-    print("\nСтруктура таблицы messages:")
-    for col in columns:
-        print(f"  {col[1]} ({col[2]}) - PK: {col[5]}")
+    print(f"Путь к базе данных: {db_path}")
+    print(f"База данных существует: {db_path.exists()}")
     
-    # Проверяем количество сообщений
-    cursor.execute('SELECT COUNT(*) FROM messages')
-    total = cursor.fetchone()[0]
-    print(f"\nВсего сообщений в БД: {total}")
+    if not db_path.exists():
+        print("База данных не найдена!")
+        return
     
-    # Проверяем последние сообщения
-    cursor.execute('SELECT id, chat_id, sender, date FROM messages ORDER BY date DESC LIMIT 5')
-    print("\nПоследние 5 сообщений:")
-    for row in cursor.fetchall():
-        print(f"  ID: {row[0]}, Chat: {row[1]}, Sender: {row[2]}, Date: {row[3]}")
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
     
-    conn.close()
-else:
-    print("База данных не найдена!")
+    try:
+        # Проверяем структуру таблицы
+        cursor.execute('PRAGMA table_info(messages)')
+        columns = cursor.fetchall()
+        print("\nСтруктура таблицы messages:")
+        for col in columns:
+            print(f"  {col[1]} ({col[2]}) - PK: {col[5]}")
+        
+        # Проверяем количество сообщений: при актуальной схеме берем готовые
+        # счетчики из message_counts вместо просмотра всей таблицы
+        cursor.execute('PRAGMA user_version')
+        if cursor.fetchone()[0] >= MESSAGE_COUNTS_SCHEMA_VERSION:
+            cursor.execute('SELECT COALESCE(SUM(n), 0) FROM message_counts')
+        else:
+            cursor.execute('SELECT COUNT(*) FROM messages')
+        total = cursor.fetchone()[0]
+        print(f"\nВсего сообщений в БД: {total}")
+        
+        # Проверяем последние сообщения
+        # Дата хранится как unix-время, для вывода переводим ее в текст
+        cursor.execute('''
+            SELECT id, chat_id, sender, datetime(date, 'unixepoch')
+            FROM messages ORDER BY date DESC LIMIT 5
+        ''')
+        print("\nПоследние 5 сообщений:")
+        for row in cursor.fetchall():
+            print(f"  ID: {row[0]}, Chat: {row[1]}, Sender: {row[2]}, Date: {row[3]} UTC")
+    finally:
+        conn.close()
+
 
+if __name__ == '__main__':
+    main()